@@ -11,6 +11,7 @@ import sys
 import pylab
 import json
 from kalman import kalman_filter
+from trajectory_store import diff_dict_reader
 from shapes import circle,square , cx ,cy
 
    
@@ -46,14 +47,14 @@ def disp(dic,disp_size):
     
 #if __name__ == "__main__":
 for i in range(1):
-    with open('data0.json') as data_file2:  
-        dict_list = json.load(data_file2) 
+    #only the four navigators plotted are read from a store (data0.json is
+    #read when there is no data0.traj)
+    diff_dict = diff_dict_reader('data0.traj')
     new_dict ={}
-    print len(dict_list)
-    kalman_dict0 = disp(dict_list[137],200)
-    kalman_dict1 = disp(dict_list[369],100)
-    kalman_dict2 = disp(dict_list[495],100)
-    kalman_dict3 = dict_list[789]
+    kalman_dict0 = disp(diff_dict(137),200)
+    kalman_dict1 = disp(diff_dict(369),100)
+    kalman_dict2 = disp(diff_dict(495),100)
+    kalman_dict3 = diff_dict(789)
 
     new_dict["diff_list0"] = kalman_dict0["diff_list{0}".format(0)] 
     new_dict["diff_list1"] = kalman_dict1["diff_list{0}".format(0)]
@@ -11,6 +11,7 @@ import numpy as np
 import json
 import scipy.stats as stats
 import seaborn as sns
+from trajectory_store import load_dict_list, is_store, load_store, find_data_file, STATES
 sns.set(style="darkgrid")
 
 
@@ -334,9 +335,75 @@ def multi_splice(list_dict,n):
         spliced_lists.append(new_list)
     return spliced_lists
 
+def group_stats(store,num):
+    """
+    Calculates the statistics of num equal groups of navigators in a single pass
+    over the columns of a trajectory store (see trajectory_store), with the same
+    definitions as succuss_precentage, average_time, average_time_relative,
+    time_standrd_error and search_efficiency. Returns a dictionary per group.
+    """
+    num_navigators = store.num_navigators
+    if num_navigators%num != 0:
+        raise Exception('Number of navigators could not be devided into %0.1i' %num)
+    num_it = store.num_it
+    start = np.asarray(store.offsets[:-1])
+    last = np.asarray(store.offsets[1:]) - 1
+    x = np.asarray(store['x'], dtype=float)
+    y = np.asarray(store['y'], dtype=float)
+    T = np.asarray(store['T'], dtype=float)
+    state = np.asarray(store['state'])
+    odor = np.asarray(store['odor'])
+    #group of each trajectory, and whether it is the first iteration
+    #(success percentage and search efficiency only use diff_list0)
+    traj = np.arange(len(start))
+    group = traj // num_it // (num_navigators//num)
+    first_it = traj % num_it == 0
+    success = np.asarray(store['success'])[last].astype(bool)
+    duds = np.bincount(group, weights=state[last] == STATES.index('wait'), minlength=num)
+    winners = np.bincount(group[first_it], weights=success[first_it], minlength=num)
+
+    #relative navigation time of the successful trajectories, relative to
+    #moving straight to the final position at the speed of the first movement
+    entry = np.arange(len(state))
+    moving = np.where(state != STATES.index('wait'), entry, len(state))
+    first_move = np.minimum.reduceat(moving, start)[success]
+    s_start, s_last = start[success], last[success]
+    speed = ((x[first_move+1]-x[first_move])**2 + (y[first_move+1]-y[first_move])**2)**0.5 \
+        / (T[first_move+1] - T[first_move])
+    opt_dist = ((x[s_last]-x[s_start])**2 + (y[s_last]-y[s_start])**2)**0.5
+    relative_time = np.abs((T[first_move] - T[s_last]) / (opt_dist/speed))
+    relative_group = group[success]
+
+    #search efficiency - the fraction of entries since odor was last found
+    #(and not lost), for the successful first iterations
+    events = np.where(odor != 0, entry, -1)
+    last_event = np.maximum.accumulate(events)
+    row_start = np.repeat(start, last - start + 1)
+    in_odor = (last_event >= row_start) & (odor[last_event] == 1)
+    efficiency = np.add.reduceat(in_odor, start) / (last - start + 1)
+    efficient = success & first_it
+
+    stats_list = []
+    for g in range(num):
+        times = relative_time[relative_group == g]
+        efficiencies = efficiency[efficient & (group == g)]
+        finishing = T[last[efficient & (group == g)]]
+        stats_list.append({
+            'success_precentage': winners[g] / (num_navigators//num - duds[g]) *100,
+            'average_time': finishing.mean() if len(finishing) else 0,
+            'relative_time': times.mean() if len(times) else 0,
+            'time_standard_error': stats.sem(times,0,1,'raise') if len(times) else 0,
+            'search_efficiency': efficiencies.mean() if len(efficiencies) else 0})
+    return stats_list
+
 def get_data(file_name,num):
-    with open(file_name) as data_file1:  
-        dict_list1 = json.load(data_file1)
+    #file_name is a trajectory store or a JSON data file, a missing file is
+    #read from the data file of the same name with another extension
+    file_name = find_data_file(file_name)
+    if is_store(file_name):
+        return [[s['success_precentage'], s['relative_time'], s['time_standard_error']]
+                for s in group_stats(load_store(file_name),num)]
+    dict_list1 = load_dict_list(file_name)
 
     spliced_lists = multi_splice(dict_list1,num)
     data_list = [calc_stats(dict_list) for dict_list in spliced_lists]
@@ -6,11 +6,39 @@ import mothpy_models
 from simulation import moth_simulation
 import json
 import copy
+import os
+import random
+import shutil
+import numpy as np
+import trajectory_store
+from result_cache import job_key
+
+#(wait, cast, nav) types of the competing navigator groups
+NAVIGATOR_GROUPS = ((1,2,'alex'), (1,3,'alex'), (1,'carde2',1), (1,'carde1',1))
+#data file extensions saved as a trajectory store rather than JSON
+STORE_EXTENSIONS = ('.traj', '.npz')
 
 def create_trajectory_data(job_file_name = 'job.json',data_file_name ='data.json',
-                           titles_file_name = 'titles.json'):
+                           titles_file_name = 'titles.json', seed = None, cache = None):
+    #trajectories are saved as JSON, or as a trajectory store (see
+    #trajectory_store) if data_file_name ends with .traj or .npz
+    #seed - seeds numpy.random and random before the simulation
+    #cache - a result_cache.ResultCache, the trajectories of a job that was
+    #already simulated (same job, navigators, seed and code) are copied from it.
+    #unseeded runs are random realisations and are never cached
     with open(job_file_name) as data_file:
         cd = json.load(data_file) #constants dictionary
+    if seed is None:
+        cache = None
+    if cache is not None:
+        key = job_key(cd, NAVIGATOR_GROUPS, seed)
+        cached = cache.store_path(key)
+        if cached is not None:
+            save_cached(cached, data_file_name)
+            return trajectory_store.load_store(cached).titles
+    if seed is not None:
+        np.random.seed(seed)
+        random.seed(seed)
     sim_region = models.Rectangle(0.,-1.,4., 1.)
 
 
@@ -45,24 +73,53 @@ def create_trajectory_data(job_file_name = 'job.json',data_file_name ='data.json
                 navigators.append(new_navigator)
                 navigator_titles.append(title)
     
-    call_navigators(1,2,'alex')
-    call_navigators(1,3,'alex')
-    call_navigators(1,'carde2',1)
-    call_navigators(1,'carde1',1)
+    for wait,cast,nav in NAVIGATOR_GROUPS:
+        call_navigators(wait,cast,nav)
      
     #run the simulation - each navigator runs through the exact same conditions
-    dict_list = moth_simulation(cd['num_it'],
-                                navigators,cd['t_max'],cd['char_time'],
-                                cd['amplitude'], cd['dt'], cd['puff_release_rate'],
-                                cd['puff_spread_rate'],
-                                1,
-                                False)
-
+    trajectories = moth_simulation(cd['num_it'],
+                                   navigators,cd['t_max'],cd['char_time'],
+                                   cd['amplitude'], cd['dt'], cd['puff_release_rate'],
+                                   cd['puff_spread_rate'],
+                                   1,
+                                   False,
+                                   conc_sampling = 'points',
+                                   use_swarm = True,
+                                   recorder = True)
 
-    with open(data_file_name, 'w') as outfile:
-        json.dump(dict_list, outfile)
+    if cache is not None:
+        #the result is cached as a directory store
+        store_name = data_file_name if data_file_name.endswith('.traj') \
+            else data_file_name + '.traj'
+        trajectory_store.save_recorder(store_name, trajectories, cd['num_it'],
+                                       navigator_titles)
+        cache.put(key, store_name, {'job': cd, 'seed': seed})
+        if store_name != data_file_name:
+            save_cached(store_name, data_file_name)
+            shutil.rmtree(store_name)
+    elif data_file_name.endswith(STORE_EXTENSIONS):
+        trajectory_store.save_recorder(data_file_name, trajectories, cd['num_it'],
+                                       navigator_titles)
+    else:
+        dict_list = trajectories.to_diff_dict_list(cd['num_it'])
+        with open(data_file_name, 'w') as outfile:
+            json.dump(dict_list, outfile)
     return navigator_titles
 
+def save_cached(store_path, data_file_name):
+    #copies a (cached) directory store to data_file_name, in its format
+    if data_file_name.endswith('.traj'):
+        if os.path.exists(data_file_name):
+            shutil.rmtree(data_file_name)
+        shutil.copytree(store_path, data_file_name)
+    elif data_file_name.endswith('.npz'):
+        store = trajectory_store.load_store(store_path)
+        trajectory_store.save_columns(data_file_name, store.columns, store.offsets,
+                                      store.num_it, store.titles)
+    else:
+        with open(data_file_name, 'w') as outfile:
+            json.dump(trajectory_store.load_store(store_path).to_dict_list(), outfile)
+
 
 
 
@@ -3,31 +3,33 @@ from __future__ import division
 __authors__ = 'Noam Benelli'
 
 
-from job_generator import generate_job
-from casting_competition import create_trajectory_data
+from sweep import run_sweep
 from graphics_from_file import save_plot, save_detection_plot
 
 """
 generates several job files containing the conditions of the simulations
 calls upon "casting competition" to create trajectory data
 (each call simulates four navigator types in one plume simulation)
+the jobs run in parallel, see sweep.py
 plots a single plot for each one
 
 """
 
 if __name__ == "__main__":
-    for i in range(4):
-        job_file_name = 'job'+ str(i)+ '.json'
-        data_file_name = 'data'+ str(i)+ '.json'
-        #titles_file_name = 'titles'+ str(i)+ '.json'       
-        generate_job(char_time = 7, amplitude = 0.05*i, job_file = job_file_name,
-                     t_max =15, puff_release_rate = 100,
-                     puff_spread_rate = 0.0003,
-                     dt = 0.01, num_it = 1)
-        navigator_titles = create_trajectory_data(job_file_name,data_file_name)
-        title = 'loop ' +str(i) 
-        #save_plot(job_file_name,data_file_name,title,navigator_titles)
-        #save_detection_plot(job_file_name,data_file_name,navigators_titles)
+    #the jobs run in parallel worker processes (see sweep.run_sweep), each
+    #one writing its job and data files when it finishes. jobs that were
+    #already simulated are copied from the result cache (see result_cache)
+    configs = [dict(char_time = 7, amplitude = 0.05*i,
+                    t_max =15, puff_release_rate = 100,
+                    puff_spread_rate = 0.0003,
+                    dt = 0.01, num_it = 1) for i in range(4)]
+    for record in run_sweep(configs, cache_dir='.result_cache'):
+        i = record['index']
+        if record['status'] == 'failed':
+            print ('simulation number ' + str(i+1) + ' failed')
+            print (record['error'])
+            continue
+        title = 'loop ' +str(i)
+        #save_plot(record['job_file'],record['data_file'],title,navigator_titles)
+        #save_detection_plot(record['job_file'],record['data_file'],navigators_titles)
         print ('finished simulation number ' + str(i+1))
-
-      
@@ -1,22 +1,31 @@
 from __future__ import division
 
 __authors__ = 'Noam Benelli'
-from kalman import kalman_filter 
+from kalman import kalman_filter_list
 from moth_graphics import plot, detection_plot
 import json
 import matplotlib.pyplot as plt
+from trajectory_store import load_dict_list, diff_dict_reader
 
 
 def save_plot(job_file_name = 'job.json',data_file_name ='data1.json',
-              title='1',navigator_titles=[]):
+              title='1',navigator_titles=[],navigators=None):
+    #navigators - indices or titles of the navigators to plot (all by default),
+    #only these are read from a trajectory store
     with open(job_file_name) as data_file:
         cd = json.load(data_file) #constants dictionary
-    with open(data_file_name) as data_file2:  
-        dict_list = json.load(data_file2) #dictionary tuple
-
+    if navigators is not None:
+        get_diff_dict = diff_dict_reader(data_file_name)
+        kalman_dicts = kalman_filter_list([get_diff_dict(navigator) for navigator in navigators])
+        for navigator,kalman_dict in zip(navigators,kalman_dicts):
+            fig, ax = plt.subplots()
+            plot(kalman_dict,str(navigator) + title,ax=ax)
+        return
+    dict_list = load_dict_list(data_file_name) #dictionary tuple
+
+    kalman_dicts = kalman_filter_list(dict_list[38:])
     for i in range(len(dict_list)-1):
-        diff_dict = dict_list[i+38]
-        kalman_dict = kalman_filter(diff_dict)
+        kalman_dict = kalman_dicts[i]
         navigator_title = str(navigator_titles[i]) + title
         fig, ax = plt.subplots()
         plot(kalman_dict,navigator_title,ax=ax)
@@ -25,13 +34,12 @@ def save_detection_plot(job_file_name = 'job.json',data_file_name ='data1.json',
                         navigator_titles = ('2','3','carde1','carde2','carde2')):
     with open(job_file_name) as data_file:
         cd = json.load(data_file) #constants dictionary
-    with open(data_file_name) as data_file2:  
-        dict_list = json.load(data_file2) #dictionary tuple
+    dict_list = load_dict_list(data_file_name) #dictionary tuple
 
     
+    kalman_dicts = kalman_filter_list(dict_list)
     for i in range(len(dict_list)):
-        diff_dict = dict_list[i]
-        kalman_dict = kalman_filter(diff_dict)
+        kalman_dict = kalman_dicts[i]
         #navigator = navigator_titles[i]
         ################################something should be done about these titles
         title =  '; amplitude = ' +str(cd['amplitude'])
@@ -41,4 +49,4 @@ def save_detection_plot(job_file_name = 'job.json',data_file_name ='data1.json',
 
 
 if __name__ == "__main__":
-    save_plot('job0.json','data0.json', '-', range(1000))
+    save_plot('job0.json','data0.traj', '-', range(1000))
@@ -113,3 +113,115 @@ def kalman_filter(diff_dict):
             kalman_dict["Kalman_list{0}".format(i)].append((kx,ky,time,odor,turning))          
     #print kalman_dict
     return kalman_dict
+
+
+def kalman_gains(dt, num_steps, tol=1e-12):
+    """
+    Returns the (4,4) Kalman gains of the first num_steps steps of the filter
+    used in kalman_filter, as an array of shape (num_steps,4,4).
+    With time invariant matrices the gains do not depend on the measurements,
+    so they are shared by every trajectory. Once the gain has converged
+    (changes by less than tol) it is repeated for the remaining steps.
+    """
+    A = np.array([[1,dt,0,0],[0,1,0,0],[0,0,1,dt],[0,0,0,1]])
+    H = np.eye(4)
+    Q = 0.0001*np.eye(4)
+    R = np.eye(4)*0.1
+    P = np.eye(4)
+    gains = np.empty((num_steps,4,4))
+    for j in range(num_steps):
+        predicted_P = A.dot(P).dot(A.T) + Q
+        innovation_covariance = H.dot(predicted_P).dot(H.T) + R
+        #K = P H^T S^-1, solved rather than inverted (S is symmetric)
+        gains[j] = np.linalg.solve(innovation_covariance, H.dot(predicted_P.T)).T
+        P = (np.eye(4) - gains[j].dot(H)).dot(predicted_P)
+        if j > 0 and np.abs(gains[j] - gains[j-1]).max() < tol:
+            gains[j+1:] = gains[j]
+            break
+    return gains
+
+
+def batch_kalman_filter(x, y, offsets, dt):
+    """
+    The filter of kalman_filter applied to all trajectories at once.
+    x,y - the positions of all trajectories one after the other, as in a
+    trajectory store; trajectory k spans offsets[k]:offsets[k+1]
+    dt - the time step of the trajectories
+    Returns (kx,ky), aligned with x and y: entry j of a trajectory holds the
+    estimate after j steps of the filter (the first one the initial state).
+    kalman_filter reports this estimate with entry j+1.
+    The gains are exact until they converge (see kalman_gains), so the
+    estimates agree with kalman_filter up to rounding - within 1e-8 for
+    positions of hundreds of grid cells (tests/test_kalman.py checks 1e-6).
+    """
+    offsets = np.asarray(offsets)
+    start = offsets[:-1]
+    length = np.diff(offsets)
+    num_steps = length.max() if len(length) else 0
+    #pad the trajectories to (N,num_steps) by repeating their last entry
+    idx = start[:,None] + np.minimum(np.arange(num_steps), length[:,None]-1)
+    X = np.asarray(x, dtype=float)[idx]
+    Y = np.asarray(y, dtype=float)[idx]
+    a_max = 0.01
+    A = np.array([[1,dt,0,0],[0,1,0,0],[0,0,1,dt],[0,0,0,1]])
+    B = np.array([[(dt**2)/2,0],[0,(dt**2)/2],[dt,0],[0,dt]])
+    gains = kalman_gains(dt, max(num_steps-1, 0))
+
+    #stacked (N,4) states of (x,vx,y,vy)
+    state = np.zeros((len(length),4))
+    state[:,0] = X[:,0]
+    state[:,2] = Y[:,0]
+    KX = np.empty(X.shape)
+    KY = np.empty(X.shape)
+    KX[:,0] = X[:,0]
+    KY[:,0] = Y[:,0]
+    v = np.zeros((len(length),2))
+    for j in range(1,num_steps):
+        v_minus_1 = v
+        v = np.stack(((X[:,j] - X[:,j-1])/dt, (Y[:,j] - Y[:,j-1])/dt), axis=1)
+        control = np.clip((v - v_minus_1)/dt, -a_max, a_max)
+        measurement = np.stack((X[:,j], v[:,0], Y[:,j], v[:,1]), axis=1)
+        predicted = state.dot(A.T) + control.dot(B.T)
+        state = predicted + (measurement - predicted).dot(gains[j-1].T)
+        KX[:,j] = state[:,0]
+        KY[:,j] = state[:,2]
+    valid = np.arange(num_steps) < length[:,None]
+    return KX[valid], KY[valid]
+
+
+def kalman_filter_list(dict_list):
+    """
+    kalman_filter of every diff_dict in dict_list, filtering all of their
+    trajectories together with batch_kalman_filter.
+    Returns a list of kalman_dicts.
+    """
+    diff_lists = [diff_dict["diff_list{0}".format(i)]
+                  for diff_dict in dict_list for i in range(len(diff_dict))]
+    kalman_lists = [None]*len(diff_lists)
+    #trajectories are batched by time step (taken from each diff_dict as in kalman_filter)
+    batches = {}
+    k = 0
+    for diff_dict in dict_list:
+        diff_list0 = diff_dict["diff_list{0}".format(0)]
+        dt = diff_list0[1][2] - diff_list0[0][2]
+        batches.setdefault(dt, []).extend(range(k, k + len(diff_dict)))
+        k += len(diff_dict)
+    for dt, batch in batches.items():
+        lengths = [len(diff_lists[k]) for k in batch]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        entries = [entry for k in batch for entry in diff_lists[k]]
+        x = [entry[0] for entry in entries]
+        y = [entry[1] for entry in entries]
+        kx, ky = batch_kalman_filter(x, y, offsets, dt)
+        for n, k in enumerate(batch):
+            #the estimate before each step is reported with its entry
+            start = offsets[n]
+            kalman_lists[k] = [(kx[start+j-1], ky[start+j-1], tup[2], tup[3], tup[4])
+                               for j, tup in enumerate(diff_lists[k]) if j > 0]
+    kalman_dict_list = []
+    k = 0
+    for diff_dict in dict_list:
+        kalman_dict_list.append(dict(("Kalman_list{0}".format(i), kalman_lists[k+i])
+                                     for i in range(len(diff_dict))))
+        k += len(diff_dict)
+    return kalman_dict_list
@@ -47,25 +47,24 @@ def process_jobs(num_jobs):
     return detect_change(job_list)
 
 
-        
+def collect_stats(num_jobs, data_file_pattern='data{0}.traj'):
+    #[succ_prec ,average_time_,sem] of the four navigator groups, per job
+    #a single pass over each data file's trajectory store (see bars.group_stats)
+    #data{i}.json (as shipped and written by line_graphs_qa) is read when
+    #there is no data{i}.traj
+    group_lists = ([],[],[],[])
+    for i in range(num_jobs):
+        data_list = get_data(data_file_pattern.format(i),4)
+        for group_list,data in zip(group_lists,data_list):
+            group_list.append(data)
+    return group_lists
    
 
 def present_graphs():
     num_jobs = 4
     (xlabel,values)=process_jobs(num_jobs)
     legends = ('A','B','C','D')
-    liberzonlist =[]
-    Benellilist = []
-    lfslist =[]
-    fslist = []
-    for i in range(num_jobs):
-        loop = str(i)
-        data_list = get_data('data'+loop+'.json',4)
-        #print (data_list[0])
-        liberzonlist.append(data_list[0])
-        Benellilist.append((data_list[1]))
-        lfslist.append((data_list[2]))
-        fslist.append((data_list[3]))
+    liberzonlist, Benellilist, lfslist, fslist = collect_stats(num_jobs)
     #[succ_prec ,average_time_,average_efficiency]
     lib_succ, lib_avg,lib_efficiency = zip(*liberzonlist)
     Bene_succ, Bene_avg,Bene_efficiency = zip(*Benellilist)
@@ -139,18 +138,7 @@ def print_data():
     num_jobs = 4
     (xlabel,values)=process_jobs(num_jobs)
     legends = ('A','B','C','D')
-    liberzonlist =[]
-    Benellilist = []
-    lfslist =[]
-    fslist = []
-    for i in range(num_jobs):
-        loop = str(i)
-        data_list = get_data('data'+loop+'.json',4)
-        #print (data_list[0])
-        liberzonlist.append(data_list[0])
-        Benellilist.append((data_list[1]))
-        lfslist.append((data_list[2]))
-        fslist.append((data_list[3]))
+    liberzonlist, Benellilist, lfslist, fslist = collect_stats(num_jobs)
     #[succ_prec ,average_time_,average_efficiency]
     lib_succ, lib_avg,lib_sem = zip(*liberzonlist)
     Bene_succ, Bene_avg,Bene_sem = zip(*Benellilist)
@@ -198,18 +186,7 @@ def output_csv():
     num_jobs = 4
     (xlabel,values)=process_jobs(num_jobs)
     legends = ('A','B','C','D')
-    liberzonlist =[]
-    Benellilist = []
-    lfslist =[]
-    fslist = []
-    for i in range(num_jobs):
-        loop = str(i)
-        data_list = get_data('data'+loop+'.json',4)
-        #print (data_list[0])
-        liberzonlist.append(data_list[0])
-        Benellilist.append((data_list[1]))
-        lfslist.append((data_list[2]))
-        fslist.append((data_list[3]))
+    liberzonlist, Benellilist, lfslist, fslist = collect_stats(num_jobs)
     #[succ_prec ,average_time_,average_efficiency]
     lib_succ, lib_avg,lib_sem = zip(*liberzonlist)
     Bene_succ, Bene_avg,Bene_sem = zip(*Benellilist)
@@ -5,6 +5,7 @@ Created on Tue Mar 19 16:22:41 2019
 @author: Noam Benelli
 """
 
+import math
 import numpy as np
 import random
 from carde_navigator import carde1, carde2, crw
@@ -15,11 +16,12 @@ from pompy import models
 class WindModel(models.WindModel):
     def __init__(self, sim_region, nx=15, ny=15, u_av=0.4,char_time = 3.5,amplitude = 0.1, v_av=0., Kx=2.,
                  Ky=2., noise_gain=0., noise_damp=0.2, noise_bandwidth=0.2, #noise_gain=5 change to 0
-                 noise_rand=np.random):
+                 noise_rand=np.random, interp_method='spline'):
         super(WindModel, self).__init__(sim_region,nx=nx,ny=ny,u_av=u_av,char_time=char_time,
                                         amplitude=amplitude,v_av=v_av,Kx=Kx,Ky=Ky,
                                         noise_gain=noise_gain, noise_damp=noise_damp,
-                                        noise_bandwidth=noise_bandwidth,noise_rand=noise_rand)
+                                        noise_bandwidth=noise_bandwidth,noise_rand=noise_rand,
+                                        interp_method=interp_method)
         # self.char_time = char_time
         # self.amplitude = amplitude
         # self.noise_gen = MeanderingGenerator(np.zeros((2, 8)), noise_damp,
@@ -46,8 +48,8 @@ class WindModel(models.WindModel):
         # velocity field values
         # self._x_points = np.linspace(sim_region.x_min, sim_region.x_max, n_x)
         # self._y_points = np.linspace(sim_region.y_min, sim_region.y_max, n_y)
-        # initialise flag to indicate velocity field interpolators not set
-        self._interp_set = True
+        # (flag indicating velocity field interpolators are not set is
+        # initialised by the base class)
     
 class MeanderingGenerator(object):
 
@@ -166,7 +168,7 @@ class MothModular(object):
         #Input self.gamma,self.beta
         self.sweep_counter +=1
     
-    def is_smelling(self,conc_array):
+    def is_smelling(self,conc_array,conc=None):
         """
         Determines whether or not the moth is sensing odor.
         A timer has been implemented in order to allow the moth navigate
@@ -174,9 +176,13 @@ class MothModular(object):
         will still act as if it is smelling it for time lamba.
 
         Input - conc_array, self.T, self.lamda
+        conc - optional, the concentration at the moth's cell when it was
+        sampled directly (conc_array is then not read and may be None)
         output - true or false, changes self.Tfirst
         """
-        if conc_array[int(self.x)][int(self.y)]>self.threshold:
+        if conc is None:
+            conc = conc_array[int(self.x)][int(self.y)]
+        if conc>self.threshold:
             self.smell_timer = self.Timer(self.T,self.lamda)
             #Nav mode three and four need to know whether the moth is smelling
             #at a specific moment, for that reason they use Tfirst.
@@ -359,11 +365,11 @@ class MothModular(object):
             crw(self,wind_vel_at_pos)
     
                                      
-    def update(self,conc_array,wind_vel_at_pos,dt):
+    def update(self,conc_array,wind_vel_at_pos,dt,conc=None):
         if self.T == 0: #because we want to start by casting
             self.smell_timer = self.Timer(self.T,dt)#start timer just not to bug out things later
             self.Tfirst = 0
-        if self.is_smelling(conc_array):
+        if self.is_smelling(conc_array,conc):
             self.navigate(wind_vel_at_pos)
             self.state = 'nav' 
         elif self.turned_on:
@@ -389,3 +395,497 @@ class MothModular(object):
         #project moth unto same matrix as the concetration
         return conc_array + moth_array
 
+
+
+class CompactMoth(object):
+    """
+    A MothModular navigator with slotted attributes and an integer clock.
+
+    Time is counted in ticks of the (constant) time step, timers are stored
+    as the tick at which they run out rather than as Timer/Stopper objects,
+    and update_gamma/update_duration run every gamma_update_period seconds
+    exactly. Otherwise the navigation, casting and waiting strategies are
+    those of MothModular and the class can be used in its place e.g. in
+    moth_simulation (though not with use_swarm, MothSwarm only holds
+    MothModular navigators).
+
+    note - MothModular tests self.T%0.1, which is truthy on almost every step,
+    so cast_type 4 moths of the two classes fly differently.
+    """
+    __slots__ = ('x', 'y', 'u', 'v', 'sim_region', 'speed', 'searching', 'turned_on',
+                 'base_beta', 'beta', 'base_gamma', 'gamma', 'base_turn_angle', 'sweep_counter',
+                 'nav_type', 'cast_type', 'wait_type', 'title', 'state',
+                 'base_duration', 'duration', 'lamda', 'alex_factor',
+                 'threshold', 'conc_max', 'base_conc', 'odor', 'last_dt_odor', 'wind_angle',
+                 'dt', 'tick', 'first_tick', 'smell_deadline', 'timer_deadline', 'stopper_tick',
+                 'gamma_update_period')
+
+    def __init__(self,sim_region,x,y,nav_type = 1,
+                 cast_type = 'carde2', wait_type = 1,
+                 beta=30, duration =0.5, speed = 200.0, dt = 0.01):
+        self.x = x
+        self.y = y
+        self.u = 0
+        self.v = 0
+        self.sim_region = sim_region
+        self.speed = speed
+        self.searching = False
+        self.turned_on = False
+        #random directions are drawn in the same order as MothModular
+        self.base_beta = (-1)**random.getrandbits(1)*np.radians(beta)
+        self.beta = self.base_beta
+        self.base_gamma = np.radians(90)
+        self.gamma = (-1)**random.getrandbits(1)*self.base_gamma
+        self.base_turn_angle = 5 #for crw
+        self.sweep_counter = 0
+        self.nav_type = nav_type
+        self.cast_type = cast_type
+        self.wait_type = wait_type
+        self.title = ' '
+        self.state = 'wait' # or 'nav' or 'cast'
+        self.base_duration = duration
+        self.duration = duration
+        self.lamda = 0.1
+        self.alex_factor = 1.5
+        self.threshold = 500
+        self.conc_max = 1
+        self.base_conc = 20000
+        self.odor = False
+        self.last_dt_odor = False
+        self.wind_angle = 0.
+        #clock - the current tick and the ticks at which events happened
+        #(first_tick - last odor detection, stopper_tick - entering the plume)
+        #or timers run out
+        self.dt = dt
+        self.tick = 0
+        self.first_tick = 0
+        self.smell_deadline = 0
+        self.timer_deadline = 0
+        self.stopper_tick = 0
+        self.gamma_update_period = 0.1
+
+    @property
+    def T(self):
+        return self.tick*self.dt
+
+    @property
+    def Tfirst(self):
+        return self.first_tick*self.dt
+
+    def ticks(self, duration):
+        #number of whole ticks a timer of the given duration runs for
+        #(the timer is running while (tick - start)*dt < duration)
+        return int(math.ceil(round(duration/self.dt, 9)))
+
+    def update_duration(self):
+        self.duration = self.base_duration*min(1,self.base_conc/self.conc_max)
+
+    def update_gamma(self):
+        self.gamma = np.sign(self.gamma)*(1.5708 - ((1.5708 - np.abs(self.base_gamma)) * min(1 , self.base_conc/self.conc_max)))
+
+    def calculate_wind_angle(self,wind_vel_at_pos):
+        self.wind_angle = np.arcsin(wind_vel_at_pos[1]/np.sqrt(wind_vel_at_pos[0]**2+wind_vel_at_pos[1]**2))
+
+    def change_direction(self):
+        self.gamma = -self.gamma
+        self.beta = np.sign(self.gamma)*np.abs(self.beta)
+        self.sweep_counter +=1
+
+    def is_smelling(self,conc_array,conc=None):
+        #see MothModular.is_smelling
+        if conc is None:
+            conc = conc_array[int(self.x)][int(self.y)]
+        if conc>self.threshold:
+            self.smell_deadline = self.tick + self.ticks(self.lamda)
+            self.first_tick = self.tick
+            self.odor = True
+            return True
+        self.odor = False
+        return self.turned_on and self.tick < self.smell_deadline
+
+    def traverse(self,angle,wind_vel_at_pos):
+        #fly at angle (beta or gamma) to the wind
+        self.calculate_wind_angle(wind_vel_at_pos)
+        self.u = -self.speed*np.cos(angle+self.wind_angle)
+        self.v = self.speed*np.sin(angle+self.wind_angle)
+
+    def go_upwind(self,wind_vel_at_pos):
+        self.calculate_wind_angle(wind_vel_at_pos)
+        self.u = -self.speed*np.cos(self.wind_angle)
+        self.v = self.speed*np.sin(self.wind_angle)
+
+    def cast2(self,wind_vel_at_pos):
+        #set timer as soon as moth isn't smelling odor, turn as soon as timer is over
+        if not self.searching:
+            self.timer_deadline = self.tick + self.ticks(self.duration)
+            self.searching = True
+            self.duration = self.base_duration
+        elif self.tick >= self.timer_deadline:
+            self.change_direction()
+            self.timer_deadline = self.tick + self.ticks(self.duration)
+        self.traverse(self.gamma,wind_vel_at_pos)
+
+    def navigate(self,wind_vel_at_pos):
+        if self.nav_type == 1:
+            self.go_upwind(wind_vel_at_pos)
+        elif self.nav_type == 2:
+            self.traverse(self.beta,wind_vel_at_pos)
+        elif self.nav_type == 3:
+            if self.first_tick == self.tick:
+                self.go_upwind(wind_vel_at_pos)
+            else:
+                self.traverse(self.beta,wind_vel_at_pos)
+        elif self.nav_type == 4:
+            since_odor = self.tick - self.first_tick
+            if since_odor < self.ticks(0.1):
+                self.beta = np.sign(self.beta)*np.radians(10)
+            elif since_odor < self.ticks(0.3):
+                self.beta = np.sign(self.beta)*np.radians(65)
+            else:
+                self.beta = np.sign(self.beta)*np.radians(80)
+            self.traverse(self.beta,wind_vel_at_pos)
+        elif self.nav_type == 'alex':
+            if not self.last_dt_odor and self.odor: #the navigator just enters a plume
+                self.stopper_tick = self.tick
+                self.last_dt_odor = True
+            if self.odor:
+                time_in_plume = (self.tick - self.stopper_tick)*self.dt
+                self.lamda = time_in_plume
+                self.duration = time_in_plume* self.alex_factor
+            else:
+                self.last_dt_odor= False
+            self.go_upwind(wind_vel_at_pos)
+        self.turned_on = True
+        self.searching = False
+
+    def cast(self,wind_vel_at_pos):
+        if self.state != 'cast' :
+            self.change_direction()
+        if self.cast_type == 0:
+            self.u=0
+            self.v=0
+        elif self.cast_type == 1:
+            self.traverse(self.gamma,wind_vel_at_pos)
+        elif self.cast_type == 2:
+            self.cast2(wind_vel_at_pos)
+        elif self.cast_type == 3:
+            if self.state != 'cast':
+                self.timer_deadline = self.tick + self.ticks(self.duration)
+                self.searching = True
+                self.duration = self.base_duration
+            elif self.tick >= self.timer_deadline:
+                self.change_direction()
+                self.timer_deadline = self.tick + self.ticks(self.duration)
+                self.duration *= 1.5
+            self.traverse(self.gamma,wind_vel_at_pos)
+        elif self.cast_type == 4:
+            #gamma and duration are updated every gamma_update_period
+            if self.tick % self.ticks(self.gamma_update_period) == 0:
+                self.update_gamma()
+                self.update_duration()
+            self.cast2(wind_vel_at_pos)
+        elif self.cast_type == 'carde1':
+            carde1(self,wind_vel_at_pos)
+        elif self.cast_type == 'carde2':
+            carde2(self,wind_vel_at_pos)
+
+    def wait(self,wind_vel_at_pos):
+        if self.wait_type == 1:
+            self.u=0
+            self.v=0
+        elif self.wait_type == 2:
+            self.traverse(self.gamma,wind_vel_at_pos)
+        elif self.wait_type == 'crw':
+            crw(self,wind_vel_at_pos)
+
+    def update(self,conc_array,wind_vel_at_pos,dt,conc=None):
+        if self.tick == 0:
+            self.dt = dt
+            self.smell_deadline = 1
+            self.first_tick = 0
+        elif dt != self.dt:
+            raise ValueError('CompactMoth needs a constant time step')
+        if self.is_smelling(conc_array,conc):
+            self.navigate(wind_vel_at_pos)
+            self.state = 'nav'
+        elif self.turned_on:
+            self.cast(wind_vel_at_pos)
+            self.state = 'cast'
+        else:
+            self.wait(wind_vel_at_pos)
+            self.state = 'wait'
+        self.x += self.u*dt
+        self.y += self.v*dt
+        self.tick += 1
+
+
+class MothSwarm(object):
+    """
+    Holds the state of many MothModular navigators as arrays and updates all
+    of them together, each nav/cast/wait strategy being applied to the moths
+    using it with masked array operations instead of a python loop.
+
+    The swarm is built from a list of MothModular navigators (copying their
+    state, so navigators appearing more than once become independent moths)
+    and an update matches MothModular.update step for step, including the
+    order of the random draws made by the 'crw' wait type. The state can be
+    written back to the navigators with to_navigators.
+    """
+    nav_types = (1, 2, 3, 4, 'alex')
+    cast_types = (0, 1, 2, 3, 4, 'carde1', 'carde2')
+    wait_types = (1, 2, 'crw')
+    states = ('wait', 'nav', 'cast')
+    WAIT, NAV, CAST = range(3)
+
+    #attributes copied from/to the navigators as they are
+    _float_attrs = ('x', 'y', 'u', 'v', 'speed', 'base_beta', 'beta',
+                    'base_gamma', 'gamma', 'base_turn_angle', 'base_duration',
+                    'duration', 'T', 'lamda', 'alex_factor', 'threshold',
+                    'conc_max', 'base_conc')
+    _bool_attrs = ('searching', 'turned_on', 'odor', 'last_dt_odor')
+
+    def __init__(self, navigators):
+        self.navigators = list(navigators)
+        for moth in self.navigators:
+            #other navigators (e.g. CompactMoth, which keeps ticks rather than
+            #timers and T) would be read with the wrong state
+            if not isinstance(moth, MothModular):
+                raise ValueError('MothSwarm only supports MothModular navigators, got {0}'.format(type(moth).__name__))
+        self.num_moths = len(self.navigators)
+        for attr in self._float_attrs:
+            setattr(self, attr, np.array([getattr(moth, attr) for moth in self.navigators], dtype=float))
+        for attr in self._bool_attrs:
+            setattr(self, attr, np.array([bool(getattr(moth, attr)) for moth in self.navigators], dtype=bool))
+        self.sweep_counter = np.array([moth.sweep_counter for moth in self.navigators], dtype=int)
+        #strategies and states are held as indices in to the tuples above
+        #note - movement types added to MothModular need adding here as well,
+        #so unknown ones are rejected rather than silently ignored
+        self.nav_type = self._codes(self.nav_types, 'nav_type')
+        self.cast_type = self._codes(self.cast_types, 'cast_type')
+        self.wait_type = self._codes(self.wait_types, 'wait_type')
+        self.state = self._codes(self.states, 'state')
+        #timers and stoppers are held as start times (and durations),
+        #nan if the navigator has not created them yet
+        self.Tfirst = self._timer_attr('Tfirst')
+        self.smell_start = self._timer_attr('smell_timer', 'T_start')
+        self.smell_duration = self._timer_attr('smell_timer', 'duration')
+        self.timer_start = self._timer_attr('timer', 'T_start')
+        self.timer_duration = self._timer_attr('timer', 'duration')
+        self.stopper_start = self._timer_attr('new_stopper', 'T_start')
+        self.wind_angle = self._timer_attr('wind_angle')
+
+    def _codes(self, values, attr):
+        codes = []
+        for moth in self.navigators:
+            if getattr(moth, attr) not in values:
+                raise ValueError('MothSwarm does not support {0} {1!r}'.format(attr, getattr(moth, attr)))
+            codes.append(values.index(getattr(moth, attr)))
+        return np.array(codes, dtype=int)
+
+    def _timer_attr(self, attr, field=None):
+        values = []
+        for moth in self.navigators:
+            value = getattr(moth, attr, None)
+            if value is not None and field is not None:
+                value = getattr(value, field)
+            values.append(np.nan if value is None else value)
+        return np.array(values, dtype=float)
+
+    @property
+    def state_names(self):
+        #the state of each moth as the strings used by MothModular
+        return [self.states[code] for code in self.state]
+
+    def to_navigators(self):
+        """
+        Writes the swarm state back to the navigators it was built from
+        (a navigator appearing more than once gets the state of its last moth).
+        """
+        for k, moth in enumerate(self.navigators):
+            for attr in self._float_attrs + self._bool_attrs:
+                setattr(moth, attr, getattr(self, attr)[k].item())
+            moth.sweep_counter = int(self.sweep_counter[k])
+            moth.state = self.states[self.state[k]]
+            if not np.isnan(self.Tfirst[k]):
+                moth.Tfirst = self.Tfirst[k].item()
+            if not np.isnan(self.smell_start[k]):
+                moth.smell_timer = MothModular.Timer(self.smell_start[k].item(), self.smell_duration[k].item())
+            if not np.isnan(self.timer_start[k]):
+                moth.timer = MothModular.Timer(self.timer_start[k].item(), self.timer_duration[k].item())
+            if not np.isnan(self.stopper_start[k]):
+                moth.new_stopper = MothModular.Stopper(self.stopper_start[k].item())
+            if not np.isnan(self.wind_angle[k]):
+                moth.wind_angle = self.wind_angle[k].item()
+
+    def update(self, concs, wind_vel_at_pos, dt, moth_idx=None):
+        """
+        Equivalent of calling MothModular.update for each moth.
+        concs - concentration at each moth's cell
+        wind_vel_at_pos - (n, 2) array of the wind velocity at each moth
+        moth_idx - optional indices of the moths to update (in increasing
+        order), the other moths are left as they are
+        """
+        if moth_idx is None:
+            moth_idx = np.arange(self.num_moths)
+        active = np.zeros(self.num_moths, dtype=bool)
+        active[moth_idx] = True
+        conc = np.zeros(self.num_moths)
+        conc[moth_idx] = concs
+        wind_vel_at_pos = np.asarray(wind_vel_at_pos, dtype=float).reshape(-1, 2)
+        wind_u = np.zeros(self.num_moths)
+        wind_v = np.zeros(self.num_moths)
+        wind_u[moth_idx] = wind_vel_at_pos[:, 0]
+        wind_v[moth_idx] = wind_vel_at_pos[:, 1]
+        #as calculate_wind_angle, evaluated for every moth and only stored for
+        #the moths whose strategy uses it
+        with np.errstate(invalid='ignore', divide='ignore'):
+            wind_angle = np.arcsin(wind_v/np.sqrt(wind_u**2+wind_v**2))
+        T = self.T
+
+        first = active & (T == 0) #because we want to start by casting
+        self.smell_start[first] = T[first]
+        self.smell_duration[first] = dt
+        self.Tfirst[first] = 0
+
+        #is_smelling
+        detect = active & (conc > self.threshold)
+        self.smell_start[detect] = T[detect]
+        self.smell_duration[detect] = self.lamda[detect]
+        self.Tfirst[detect] = T[detect]
+        self.odor[active] = detect[active]
+        smell_running = T - self.smell_start < self.smell_duration
+        smelling = detect | (active & self.turned_on & smell_running)
+        nav = smelling
+        cast = active & ~smelling & self.turned_on
+        wait = active & ~smelling & ~self.turned_on
+
+        self._navigate(nav, wind_angle)
+        self._cast(cast, wind_angle)
+        self._wait(wait, wind_angle)
+        self.state[nav] = self.NAV
+        self.state[cast] = self.CAST
+        self.state[wait] = self.WAIT
+
+        self.x[active] += self.u[active]*dt
+        self.y[active] += self.v[active]*dt
+        self.T[active] += dt
+
+    #motion helpers, applied to the moths in mask
+    def _go_upwind(self, mask, wind_angle):
+        self.wind_angle[mask] = wind_angle[mask]
+        self.u[mask] = -self.speed[mask]*np.cos(wind_angle[mask])
+        self.v[mask] = self.speed[mask]*np.sin(wind_angle[mask])
+
+    def _traverse(self, mask, angle, wind_angle):
+        #fly at angle to the wind (angle is beta or gamma)
+        self.wind_angle[mask] = wind_angle[mask]
+        self.u[mask] = -self.speed[mask]*np.cos(angle[mask]+wind_angle[mask])
+        self.v[mask] = self.speed[mask]*np.sin(angle[mask]+wind_angle[mask])
+
+    def _change_direction(self, mask):
+        self.gamma[mask] = -self.gamma[mask]
+        self.beta[mask] = np.sign(self.gamma[mask])*np.abs(self.beta[mask])
+        self.sweep_counter[mask] += 1
+
+    def _cast2(self, mask, wind_angle):
+        start = mask & ~self.searching
+        turn = mask & self.searching & ~(self.T - self.timer_start < self.timer_duration)
+        self.timer_start[start] = self.T[start]
+        self.timer_duration[start] = self.duration[start]
+        self.searching[start] = True
+        self.duration[start] = self.base_duration[start]
+        self._change_direction(turn)
+        self.timer_start[turn] = self.T[turn]
+        self.timer_duration[turn] = self.duration[turn]
+        self._traverse(mask, self.gamma, wind_angle)
+
+    def _navigate(self, nav, wind_angle):
+        nav_type = self.nav_type
+        self._go_upwind(nav & (nav_type == 0), wind_angle)
+        self._traverse(nav & (nav_type == 1), self.beta, wind_angle)
+        nav3 = nav & (nav_type == 2)
+        self._go_upwind(nav3 & (self.Tfirst == self.T), wind_angle)
+        self._traverse(nav3 & (self.Tfirst != self.T), self.beta, wind_angle)
+        nav4 = nav & (nav_type == 3)
+        since_odor = self.T - self.Tfirst
+        angle = np.where(since_odor < 0.1, np.radians(10),
+                         np.where(since_odor < 0.3, np.radians(65), np.radians(80)))
+        self.beta[nav4] = np.sign(self.beta[nav4])*angle[nav4]
+        self._traverse(nav4, self.beta, wind_angle)
+        alex = nav & (nav_type == 4)
+        enter = alex & ~self.last_dt_odor & self.odor #the navigator just enters a plume
+        self.stopper_start[enter] = self.T[enter]
+        self.last_dt_odor[enter] = True
+        in_plume = alex & self.odor
+        time_in_plume = self.T[in_plume] - self.stopper_start[in_plume]
+        self.lamda[in_plume] = time_in_plume
+        self.duration[in_plume] = time_in_plume*self.alex_factor[in_plume]
+        self.last_dt_odor[alex & ~self.odor] = False
+        self._go_upwind(alex, wind_angle)
+        self.turned_on[nav] = True
+        self.searching[nav] = False
+
+    def _cast(self, cast, wind_angle):
+        cast_type = self.cast_type
+        new_cast = cast & (self.state != self.CAST)
+        self._change_direction(new_cast)
+        cast0 = cast & (cast_type == 0)
+        self.u[cast0] = 0
+        self.v[cast0] = 0
+        self._traverse(cast & (cast_type == 1), self.gamma, wind_angle)
+        self._cast2(cast & (cast_type == 2), wind_angle)
+        cast3 = cast & (cast_type == 3)
+        start = cast3 & new_cast
+        turn = cast3 & ~new_cast & ~(self.T - self.timer_start < self.timer_duration)
+        self.timer_start[start] = self.T[start]
+        self.timer_duration[start] = self.duration[start]
+        self.searching[start] = True
+        self.duration[start] = self.base_duration[start]
+        self._change_direction(turn)
+        self.timer_start[turn] = self.T[turn]
+        self.timer_duration[turn] = self.duration[turn]
+        self.duration[turn] *= 1.5
+        self._traverse(cast3, self.gamma, wind_angle)
+        #cast_type 4 updates gamma and duration as update_gamma and
+        #update_duration before casting as cast_type 2
+        cast4 = cast & (cast_type == 4)
+        odor_scale = np.minimum(1, self.base_conc/self.conc_max)
+        update = cast4 & (self.T % 0.1 != 0)
+        self.gamma[update] = np.sign(self.gamma[update])*(1.5708 - ((1.5708 - np.abs(self.base_gamma[update]))
+                                                                   * odor_scale[update]))
+        self.duration[update] = self.base_duration[update]*odor_scale[update]
+        self._cast2(cast4, wind_angle)
+        #carde1 and carde2 - see carde_navigator
+        carde1 = cast & (cast_type == 5)
+        self.sweep_counter[carde1 & new_cast] = 1
+        long_sweep = carde1 & (self.sweep_counter >= 6)
+        self.duration[carde1] = self.base_duration[carde1]
+        self.duration[long_sweep] = 3*self.base_duration[long_sweep]
+        self.sweep_counter[long_sweep & (self.sweep_counter == 7)] = 0
+        self.sweep_counter[carde1] += 1
+        self._cast2(carde1, wind_angle)
+        carde2 = cast & (cast_type == 6)
+        self.sweep_counter[carde2 & new_cast] = 1
+        long_sweep = carde2 & (self.sweep_counter % 7 == 0)
+        self.duration[carde2] = self.base_duration[carde2]
+        self.duration[long_sweep] = 7*self.base_duration[long_sweep]
+        self.sweep_counter[carde2] += 1
+        self._cast2(carde2, wind_angle)
+
+    def _wait(self, wait, wind_angle):
+        wait1 = wait & (self.wait_type == 0)
+        self.u[wait1] = 0
+        self.v[wait1] = 0
+        self._traverse(wait & (self.wait_type == 1), self.gamma, wind_angle)
+        #the correlated random walk draws from the global random state moth
+        #by moth, so it is kept as a loop to draw in the same order as crw
+        for k in np.flatnonzero(wait & (self.wait_type == 2)):
+            if self.v[k] == 0. and self.u[k] == 0.:
+                current_angle = 3.14*np.random.rand(1)[0] #start with a random angle
+            else:
+                current_angle = np.arctan2(self.v[k], self.u[k])
+            turn_angle = 0.0174533*np.random.normal(self.base_turn_angle[k], 1)
+            turn_angle = np.random.choice([-1, 1])*turn_angle
+            new_angle = current_angle + turn_angle
+            self.u[k] = self.speed[k]*np.cos(new_angle)
+            self.v[k] = self.speed[k]*np.sin(new_angle)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Record-once, replay-many plume "tapes".
+
+A tape is a directory holding the wind grid and the puff array of every step
+of a simulation, appended to flat binary files as the simulation runs:
+    wind.dat - the (2, nx+2, ny+2) u and v grids (with boundaries) of each step
+    puffs.dat - the (num_puffs, 4) puff arrays of all steps one after the other
+    index.dat - (start, num_puffs) rows of puffs.dat for each step
+    meta.json - the time step and the wind grid parameters
+The number of steps is taken from the sizes of the files, so a tape whose
+recording was interrupted can still be replayed up to its last complete step.
+ReplayWindModel and ReplayPlumeModel read a tape through memory maps and
+can be used by moth_simulation in place of the live models, giving a bit
+identical environment for any set of navigators.
+"""
+
+from __future__ import division
+
+__authors__ = 'Noam Benelli'
+
+import json
+import os
+import numpy as np
+from pompy import models
+
+
+class PlumeTapeRecorder(object):
+    """
+    Appends the state of a wind model and a plume model to a tape after
+    every update.
+    """
+    def __init__(self, path, wind_model, plume_model, dt):
+        self.path = path
+        self.wind_model = wind_model
+        self.plume_model = plume_model
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        region = _wind_region(wind_model)
+        self.meta = {'dt': dt, 'nx': wind_model.nx, 'ny': wind_model.ny,
+                     'wind_region': region, 'interp_method': wind_model.interp_method,
+                     'sim_region': plume_model.sim_region.as_tuple(), 'num_steps': 0}
+        self._wind_file = open(os.path.join(path, 'wind.dat'), 'wb')
+        self._puff_file = open(os.path.join(path, 'puffs.dat'), 'wb')
+        self._index_file = open(os.path.join(path, 'index.dat'), 'wb')
+        self._num_rows = 0
+        #written up front so that the tape can be opened before it is closed
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, 'meta.json'), 'w') as meta_file:
+            json.dump(self.meta, meta_file)
+
+    def record(self):
+        #appends the current wind grids and puffs as the next step of the tape
+        state = self.wind_model.get_state()
+        self._wind_file.write(np.ascontiguousarray(np.stack((state['u'], state['v']))).tobytes())
+        puffs = np.ascontiguousarray(self.plume_model.puff_array, dtype=np.float64)
+        self._puff_file.write(puffs.tobytes())
+        self._index_file.write(np.array([self._num_rows, len(puffs)], dtype=np.int64).tobytes())
+        self._num_rows += len(puffs)
+        self.meta['num_steps'] += 1
+
+    def close(self):
+        for tape_file in (self._wind_file, self._puff_file, self._index_file):
+            tape_file.close()
+        self._write_meta()
+
+
+def _wind_region(wind_model):
+    #the (x_min, y_min, x_max, y_max) region of a wind model's grid
+    return (wind_model.x_points[0], wind_model.y_points[0],
+            wind_model.x_points[-1], wind_model.y_points[-1])
+
+
+class PlumeTape(object):
+    """
+    Read only, memory mapped access to a recorded tape.
+    """
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as meta_file:
+            self.meta = json.load(meta_file)
+        self.dt = self.meta['dt']
+        #the steps whose wind grid, index row and puffs are all on disk
+        frame_shape = (2, self.meta['nx'] + 2, self.meta['ny'] + 2)
+        num_frames = os.path.getsize(os.path.join(path, 'wind.dat')) // \
+            (8*int(np.prod(frame_shape)))
+        index = np.fromfile(os.path.join(path, 'index.dat'), dtype=np.int64)
+        index = index[:len(index) // 2 * 2].reshape(-1, 2)
+        stored_rows = os.path.getsize(os.path.join(path, 'puffs.dat')) // (8*4)
+        #the last puff row of each step, which never decreases
+        num_complete = np.searchsorted(index.sum(axis=1), stored_rows, side='right')
+        self.num_steps = int(min(num_frames, num_complete))
+        self.index = index[:self.num_steps]
+        self.wind = np.memmap(os.path.join(path, 'wind.dat'), dtype=np.float64,
+                              mode='r', shape=(self.num_steps,) + frame_shape) \
+            if self.num_steps else np.empty((0,) + frame_shape)
+        num_rows = self.index[-1].sum() if self.num_steps else 0
+        self.puffs = np.memmap(os.path.join(path, 'puffs.dat'), dtype=np.float64,
+                               mode='r', shape=(num_rows, 4)) if num_rows else np.empty((0, 4))
+
+    def puff_array(self, step):
+        start, num_puffs = self.index[step]
+        return self.puffs[start:start + num_puffs]
+
+    def check_step(self, step):
+        if step >= self.num_steps:
+            raise IndexError('plume tape has only {0} steps'.format(self.num_steps))
+
+
+class ReplayWindModel(models.WindModel):
+    """
+    A wind model whose update loads the next recorded grid of a tape instead
+    of integrating the field. Velocities are interpolated from the grid
+    exactly as in the recorded model.
+    """
+    def __init__(self, tape):
+        meta = tape.meta
+        super(ReplayWindModel, self).__init__(models.Rectangle(*meta['wind_region']),
+                                              meta['nx'], meta['ny'],
+                                              interp_method=meta['interp_method'])
+        self.tape = tape
+        self.step = 0
+
+    def update(self, dt):
+        self.tape.check_step(self.step)
+        self._u[...] = self.tape.wind[self.step, 0]
+        self._v[...] = self.tape.wind[self.step, 1]
+        self._interp_set = False
+        self.step += 1
+
+
+class ReplayPlumeModel(object):
+    """
+    A plume model whose update moves to the next recorded step of a tape.
+    puff_array is a (read only) view of the tape.
+    """
+    def __init__(self, tape):
+        self.tape = tape
+        self.sim_region = models.Rectangle(*tape.meta['sim_region'])
+        self.step = 0
+        self._puffs = np.empty((0, 4))
+
+    def update(self, dt):
+        self.tape.check_step(self.step)
+        self._puffs = self.tape.puff_array(self.step)
+        self.step += 1
+
+    @property
+    def num_puffs(self):
+        return len(self._puffs)
+
+    @property
+    def puff_array(self):
+        return self._puffs
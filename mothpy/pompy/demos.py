@@ -36,11 +36,12 @@ def _set_up_figure(title_text):
 
 
 def _simulation_loop(dt, t_max, time_text, draw_iter_interval, update_func,
-                     draw_func):
+                     draw_func, stop_func=None):
     """Helper function for running simulation loop.
 
     Runs loop with time-step updates  applied to models in update_func and any
-    relevant drawing actions applied in draw_func.
+    relevant drawing actions applied in draw_func. If stop_func is given the
+    loop ends before t_max once it returns True (checked after each draw).
     """
     num_iter = int(t_max/dt + 0.5)
     for i in range(1, num_iter + 1):
@@ -49,6 +50,8 @@ def _simulation_loop(dt, t_max, time_text, draw_iter_interval, update_func,
         # only update display after a batch of updates to increase speed
         if i % draw_iter_interval == 0:
             draw_func()
+            if stop_func is not None and stop_func():
+                break
 
             
 def wind_model_demo(dt=0.01, t_max=20, draw_iter_interval=20):
@@ -9,6 +9,8 @@ __authors__ = 'Matt Graham'
 __license__ = 'MIT'
 
 import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
 
@@ -19,6 +21,10 @@ class ConcentrationValueCalculator(object):
     puff property arrays.
     """
 
+    # number of (points, puffs) sized float arrays alive at once when
+    # evaluating the puff concentration distributions
+    _temps_per_value = 3
+
     def __init__(self, puff_molecular_amount):
         """
         Parameters
@@ -39,7 +45,7 @@ class ConcentrationValueCalculator(object):
             np.exp(-((x - px)**2 + (y - py)**2 + (z - pz)**2) / (2 * r_sq))
         )
 
-    def calc_conc_point(self, puff_array, x, y, z=0):
+    def calc_conc_point(self, puff_array, x, y, z=0, index=None):
         """
         Calculate concentration at a single point.
 
@@ -55,13 +61,21 @@ class ConcentrationValueCalculator(object):
             y-coordinate of point.
         z : float
             z-coordinate of point.
+        index : PuffSpatialIndex
+            Optional spatial index built from puff_array. If given only the
+            puffs within the index kernel_rad_mult radii of the point are
+            summed and puff_array is not read. The value is then a truncated
+            sum, see `PuffSpatialIndex` for the error.
         """
+        if index is not None:
+            return self._calc_conc_indexed(index, np.array([x]),
+                                           np.array([y]), z)[0]
         # filter for non-nan puff entries and separate properties for
         # convenience
         px, py, pz, r_sq = puff_array[~np.isnan(puff_array[:, 0]), :].T
         return self._puff_conc_dist(x, y, z, px, py, pz, r_sq).sum(-1)
 
-    def calc_conc_list(self, puff_array, x, y, z=0):
+    def calc_conc_list(self, puff_array, x, y, z=0, index=None):
         """
         Calculate concentrations across a 1D list of points in a xy-plane.
 
@@ -77,7 +91,16 @@ class ConcentrationValueCalculator(object):
             1D array of y-coordinates of points.
         z : float
             z-coordinate (height) of plane.
+        index : PuffSpatialIndex
+            Optional spatial index built from puff_array. If given only the
+            puffs within the index kernel_rad_mult radii of each point are
+            summed, without forming a (points, puffs) array, and puff_array
+            is not read. The values are then truncated sums, see
+            `PuffSpatialIndex` for the error.
         """
+        if index is not None:
+            return self._calc_conc_indexed(index, np.asarray(x, dtype=float),
+                                           np.asarray(y, dtype=float), z)
         # filter for non-nan puff entries and separate properties for
         # convenience
         px, py, pz, r_sq = puff_array[~np.isnan(puff_array[:, 0]), :].T
@@ -85,10 +108,18 @@ class ConcentrationValueCalculator(object):
         return self._puff_conc_dist(x[:, na], y[:, na], z, px[na, :],
                                     py[na, :], pz[na, :], r_sq[na, :]).sum(-1)
 
-    def calc_conc_grid(self, puff_array, x, y, z=0):
+    def calc_conc_grid(self, puff_array, x, y, z=0, max_chunk_bytes=None,
+                       out=None, num_threads=None):
         """
         Calculate concentrations across a 2D grid of points in a xy-plane.
 
+        By default the concentration distributions of all puffs at all grid
+        points are evaluated as one (nx, ny, n_puffs) array. If
+        `max_chunk_bytes` is given the grid points and puffs are instead
+        split in to tiles evaluated in turn, with the temporary arrays for
+        each tile kept within (approximately) that size, and the tiles can
+        be spread across a pool of threads.
+
         Parameters
         ----------
         puff_array : numpy-array-like of Puff objects
@@ -101,14 +132,314 @@ class ConcentrationValueCalculator(object):
             2D array of y-coordinates of grid points.
         z : float
             z-coordinate (height) of grid plane.
+        max_chunk_bytes : integer
+            Optional bound on the memory used by the temporary arrays when
+            evaluating each tile. Each thread uses up to this much.
+        out : (nx,ny) numpy-array of floats
+            Optional C-contiguous array to write the concentrations to.
+        num_threads : integer
+            Number of threads to evaluate tiles with when max_chunk_bytes is
+            given. Defaults to evaluating tiles in the calling thread.
         """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if out is not None and (out.shape != x.shape or
+                                not out.flags.c_contiguous):
+            raise ValueError('out must be a C-contiguous array of the same '
+                             'shape as x.')
         # filter for non-nan puff entries and separate properties for
         # convenience
         px, py, pz, r_sq = puff_array[~np.isnan(puff_array[:, 0]), :].T
-        na = np.newaxis
-        return self._puff_conc_dist(x[:, :, na], y[:, :, na], z,
-                                    px[na, na, :], py[na, na, :],
-                                    pz[na, na, :], r_sq[na, na, :]).sum(-1)
+        if max_chunk_bytes is None:
+            na = np.newaxis
+            conc = self._puff_conc_dist(x[:, :, na], y[:, :, na], z,
+                                        px[na, na, :], py[na, na, :],
+                                        pz[na, na, :],
+                                        r_sq[na, na, :]).sum(-1)
+            if out is None:
+                return conc
+            out[...] = conc
+            return out
+        if out is None:
+            out = np.empty(x.shape)
+        x, y, out_flat = x.ravel(), y.ravel(), out.reshape(-1)
+        # number of (point, puff) values per tile allowing for the few
+        # temporary arrays of that size used in evaluating the distribution
+        tile_size = max(max_chunk_bytes // (self._temps_per_value * 8), 1)
+        puff_step = max(min(px.size, tile_size), 1)
+        point_step = max(tile_size // puff_step, 1)
+
+        def calc_tile(start):
+            points = slice(start, start + point_step)
+            tile = np.zeros(x[points].size)
+            for p in range(0, px.size, puff_step):
+                puffs = slice(p, p + puff_step)
+                tile += self._puff_conc_dist(
+                    x[points, None], y[points, None], z, px[None, puffs],
+                    py[None, puffs], pz[None, puffs],
+                    r_sq[None, puffs]).sum(-1)
+            out_flat[points] = tile
+
+        starts = range(0, x.size, point_step)
+        if num_threads is None or num_threads <= 1:
+            for start in starts:
+                calc_tile(start)
+        else:
+            # numpy releases the GIL in the elementwise operations so tiles
+            # (which write to disjoint parts of out) can run concurrently
+            with ThreadPoolExecutor(num_threads) as executor:
+                list(executor.map(calc_tile, starts))
+        return out
+
+    def _calc_conc_indexed(self, index, x, y, z):
+        # sum the concentration distributions of the puffs within
+        # kernel_rad_mult radii of each point found using a spatial index
+        point_idx, (px, py, pz, r_sq) = index.candidates(x, y)
+        dist_sq = ((x[point_idx] - px)**2 + (y[point_idx] - py)**2 +
+                   (z - pz)**2)
+        near = dist_sq <= index.kernel_rad_mult**2 * r_sq
+        values = (self._ampl_const / r_sq[near]**1.5 *
+                  np.exp(-dist_sq[near] / (2 * r_sq[near])))
+        # (bincount returns integers when there are no values)
+        return np.bincount(point_idx[near], values,
+                           minlength=x.size).astype(float)
+
+
+class PuffSpatialIndex(object):
+
+    """
+    Uniform grid spatial index of puff centres in the xy-plane, used to find
+    the puffs within `kernel_rad_mult` radii of query points without
+    visiting every puff.
+
+    As puff radii span orders of magnitude over their lifetime, puffs are
+    split in to levels by radius, rounded up to a power of two, and each
+    level is indexed by its own grid with cells `kernel_rad_mult` times the
+    level radius wide. All the puffs within range of a point then have
+    centres in the 3 x 3 block of cells around it on each level, so queries
+    only visit those cells. Cells are found by binary search over the
+    sorted keys of the occupied cells rather than with a dense array, so
+    memory scales with the number of puffs rather than the area covered.
+
+    The index should be rebuilt with `update` whenever the puffs change
+    e.g. once per simulation time step.
+
+    Concentrations summed over the puffs found by the index are truncated
+    approximations of the exact sum over all puffs: a puff beyond the cutoff
+    contributes less than exp(-kernel_rad_mult**2 / 2) of its peak value
+    where it is dropped. With the default kernel_rad_mult=3 (as used by
+    `ConcentrationArrayGenerator`, so indexed values match the rendered
+    arrays) that is 1.1% and the sums differ from the exact ones by around
+    1% in the plume, with points only reached by the tails of puffs left at
+    zero. kernel_rad_mult=4 (0.03%) or 5 (4e-6) give closer values at the
+    cost of visiting more puffs per point.
+    """
+
+    def __init__(self, puff_array=None, kernel_rad_mult=3):
+        """
+        Parameters
+        ----------
+        puff_array : numpy-array-like of floats
+            Optional initial array of puff properties (x, y, z, r_sq) with
+            one row per puff, nan rows being ignored.
+        kernel_rad_mult : float
+            Multiplier of the puff radius beyond which puffs are considered
+            to not contribute to the concentration at a point, which sets the
+            truncation error (see above).
+        """
+        self.kernel_rad_mult = kernel_rad_mult
+        self.update(np.zeros((0, 4)) if puff_array is None else puff_array)
+
+    def update(self, puff_array):
+        """
+        Rebuilds the index from an array of puff properties.
+
+        Parameters
+        ----------
+        puff_array : numpy-array-like of floats
+            Array of puff properties (x, y, z, r_sq) with one row per puff,
+            nan rows being ignored.
+        """
+        puff_array = np.asarray(puff_array, dtype=float).reshape(-1, 4)
+        puff_array = puff_array[~np.isnan(puff_array[:, 0])]
+        self.num_puffs = puff_array.shape[0]
+        # smallest power of two >= puff radius, levels being numbered by
+        # counting over the (small) range of levels present
+        level = np.ceil(0.5 * np.log2(puff_array[:, 3])).astype(int)
+        min_level = level.min() if self.num_puffs > 0 else 0
+        present = np.bincount(level - min_level) > 0
+        self._levels = np.flatnonzero(present) + min_level
+        level = (np.cumsum(present) - 1)[level - min_level]
+        self._cell_sizes = self.kernel_rad_mult * 2.**self._levels
+        cell_size = self._cell_sizes[level]
+        # (np.floor of the quotient is several times faster than float //)
+        cell_x = np.floor(puff_array[:, 0] / cell_size)
+        cell_y = np.floor(puff_array[:, 1] / cell_size)
+        # group puffs by level and cell with a linear time radix sort on the
+        # (level, cell_x, cell_y) keys rather than a comparison sort
+        order = self._radix_order((cell_y, cell_x, level))
+        keys = self._cell_keys(level[order], cell_x[order], cell_y[order])
+        new_cell = np.ones(keys.size, dtype=bool)
+        new_cell[1:] = keys[1:] != keys[:-1]
+        self._starts = np.flatnonzero(new_cell)
+        self._keys = keys[self._starts]
+        self._counts = np.diff(np.append(self._starts, keys.size))
+        # puff properties stored as separate contiguous arrays ordered by
+        # level and cell
+        self._puffs = tuple(col.take(order) for col in puff_array.T)
+
+    @staticmethod
+    def _radix_order(digits):
+        # stable ordering of the rows by the integer valued columns in
+        # `digits`, least significant first, splitting each column in to 16
+        # bit digits for which numpy's stable argsort is a counting (radix)
+        # sort, and skipping digits that are the same for all rows
+        order = np.arange(digits[0].size)
+        for column in digits:
+            if column.size == 0:
+                break
+            column = (column - column.min()).astype(np.int64)
+            shift = 0
+            while (column.max() >> shift) > 0:
+                digit = ((column[order] >> shift) & 0xffff).astype(np.uint16)
+                order = order[np.argsort(digit, kind='stable')]
+                shift += 16
+        return order
+
+    @staticmethod
+    def _cell_keys(level, cell_x, cell_y):
+        # combine level indices and (float) integer cell coordinates in to
+        # single integer keys, cell coordinates being clipped to the range
+        # the keys can hold (points that far apart are out of range of each
+        # other anyway)
+        lim = 2**27 - 2
+        cell_x = np.clip(cell_x, -lim, lim).astype(np.int64) + 2**27
+        cell_y = np.clip(cell_y, -lim, lim).astype(np.int64) + 2**27
+        return (np.int64(level) << 56) + (cell_x << 28) + cell_y
+
+    def candidates(self, x, y):
+        """
+        Finds the puffs with centres in the cells neighbouring each of a set
+        of query points, a superset of those within `kernel_rad_mult` radii.
+
+        Parameters
+        ----------
+        x : (np) numpy-array-like of floats
+            1D array of x-coordinates of points.
+        y : (np) numpy-array-like of floats
+            1D array of y-coordinates of points.
+
+        Returns a tuple (point_idx, (px, py, pz, r_sq)) of arrays with one
+        entry per (point, puff) pair found where point_idx is the index of
+        the query point and (px, py, pz, r_sq) the puff properties.
+        """
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+        if self.num_puffs == 0:
+            empty = np.zeros(0)
+            return np.zeros(0, dtype=int), (empty, empty, empty, empty)
+        # keys of the 3 x 3 cells around each point on each level
+        offsets = np.array([-1., 0., 1.])
+        level = np.arange(self._levels.size)[None, :, None, None]
+        cell_size = self._cell_sizes[None, :, None, None]
+        keys = self._cell_keys(
+            level, np.floor(x[:, None, None, None] / cell_size) +
+            offsets[:, None],
+            np.floor(y[:, None, None, None] / cell_size) + offsets).ravel()
+        pos = np.minimum(np.searchsorted(self._keys, keys),
+                         self._keys.size - 1)
+        num = np.where(self._keys[pos] == keys, self._counts[pos], 0)
+        # expand each (point, cell) to the puffs in the cell
+        cell_idx = np.repeat(np.arange(num.size), num)
+        puff_idx = (np.arange(cell_idx.size) -
+                    np.repeat(np.cumsum(num) - num, num) +
+                    self._starts[pos][cell_idx])
+        return (cell_idx // (9 * self._levels.size),
+                tuple(col[puff_idx] for col in self._puffs))
+
+
+class PuffKernelCache(object):
+
+    """
+    Least recently used store of puff kernel arrays bounded by the total
+    memory used by the kernels it holds.
+
+    Kernels are stored read-only against hashable keys. When adding a kernel
+    would take the total size over `max_bytes`, the least recently used
+    kernels are evicted until it fits. Kernels larger than the whole budget
+    are not stored. The number of hits, misses and evictions are counted to
+    allow the budget and quantization tolerance to be tuned.
+    """
+
+    def __init__(self, max_bytes=2**26):
+        """
+        Parameters
+        ----------
+        max_bytes : integer
+            Maximum total size in bytes of the kernel arrays held.
+        """
+        self.max_bytes = max_bytes
+        self._kernels = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._kernels)
+
+    def __contains__(self, key):
+        return key in self._kernels
+
+    def get(self, key):
+        """
+        Returns the kernel stored against key (marking it as most recently
+        used) or None if there is no such kernel.
+        """
+        kernel = self._kernels.get(key)
+        if kernel is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._kernels.move_to_end(key)
+        return kernel
+
+    def put(self, key, kernel):
+        """
+        Stores a kernel against key, evicting least recently used kernels as
+        needed to stay within the memory budget.
+        """
+        if kernel.nbytes > self.max_bytes:
+            return
+        if key in self._kernels:
+            self.num_bytes -= self._kernels.pop(key).nbytes
+        while self.num_bytes + kernel.nbytes > self.max_bytes:
+            self.num_bytes -= self._kernels.popitem(last=False)[1].nbytes
+            self.evictions += 1
+        kernel.flags.writeable = False
+        self._kernels[key] = kernel
+        self.num_bytes += kernel.nbytes
+
+    def clear(self):
+        """Removes all kernels and resets the statistics."""
+        self._kernels.clear()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        """Fraction of lookups which found a stored kernel."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.
+
+    def stats(self):
+        """Returns a dictionary summarising the cache usage."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hit_rate,
+                'num_kernels': len(self), 'num_bytes': self.num_bytes,
+                'max_bytes': self.max_bytes}
 
 
 class ConcentrationArrayGenerator(object):
@@ -146,7 +477,32 @@ class ConcentrationArrayGenerator(object):
     with sub-grid resolution, giving improved accuracy at the cost of
     increased computational cost versus using a precomputed radial field
     aligned with the grid to compute kernel values or using a library of
-    precomputed kernels.
+    precomputed kernels. As the Gaussian kernels are separable each is
+    computed as the outer product of 1D Gaussians in x and y, requiring
+    O(w + h) rather than O(w * h) exponential evaluations for a w x h kernel.
+
+    Two engines are available for depositing the puff kernels in to the
+    concentration array. The 'loop' engine processes puffs one at a time in
+    Python. The default 'batched' engine groups puffs by kernel dimensions,
+    evaluates all the kernels in a group as one stacked array and adds them
+    to the array with a single scatter-add (`numpy.add.at`), which is
+    several times faster when there are many puffs. Both give the same
+    result up to floating point rounding from the order of summation.
+
+    As most puffs share the same initial radius and spread rate, the puff
+    kernels take a limited set of shapes. Optionally kernels can be kept in
+    a `PuffKernelCache` bounded by `kernel_cache_bytes` and reused rather
+    than recomputed on each call. To make repeats likely the kernel
+    parameters are then snapped to a grid set by `kernel_cache_tol`, with
+    steps scaled to the puff radius so kernel values change by roughly
+    `kernel_cache_tol` relative, trading accuracy for throughput. Puffs
+    whose cross-section in the array plane is close to the truncation
+    radius can change by more as their kernel extent changes. The cache is
+    used for all puffs with the 'loop' engine and for the large kernels
+    added one at a time by the 'batched' engine (small kernels are evaluated
+    together in a stack which is cheaper than looking them up); the
+    quantization is applied to all puffs with either engine so both give
+    the same result. Cache statistics are available from `kernel_cache`.
 
     For cases where the array region cover the whole simulation region the
     computational cost could also be reduced by increasing the size of the
@@ -157,8 +513,21 @@ class ConcentrationArrayGenerator(object):
     concentration distribution which extends beyond its extents.
     """
 
+    # engines which can be used to generate concentration arrays
+    engines = ('batched', 'loop')
+
+    # maximum number of kernel values accumulated by the batched engine
+    # before they are added to the concentration array, bounding the
+    # memory used for the stacked kernels and destination indices
+    max_batch_cells = 2**22
+
+    # kernels with more values than this are added to the concentration
+    # array slice by slice rather than with the scatter-add
+    max_scatter_kernel_cells = 1024
+
     def __init__(self, array_xy_region, array_z, nx, ny, puff_mol_amount,
-                 kernel_rad_mult=3):
+                 kernel_rad_mult=3, engine='batched',
+                 kernel_cache_bytes=None, kernel_cache_tol=0.01):
         """
         Parameters
         ----------
@@ -184,7 +553,28 @@ class ConcentrationArrayGenerator(object):
             kernel calculated to. The default value of 3 will truncate the
             Gaussian kernel at (or above) the point at which the concentration
             has dropped to 0.004 of the peak value at the puff centre.
+        engine : string
+            Either 'batched' (default) to process puffs in vectorised groups
+            or 'loop' to process puffs one at a time.
+        kernel_cache_bytes : integer or None
+            Memory budget in bytes of a cache of puff kernels reused between
+            calls. If None (default) kernels are always recomputed.
+        kernel_cache_tol : float
+            Approximate relative change in kernel values allowed when
+            snapping the kernel parameters to share cached kernels, with the
+            sub-grid shifts and z offset snapped to steps proportional to
+            the puff radius and the radius to a relative step. If zero
+            parameters are not snapped and only exactly repeated kernels
+            are reused.
         """
+        if engine not in self.engines:
+            raise ValueError('engine must be one of {0}.'.format(self.engines))
+        if kernel_cache_tol < 0:
+            raise ValueError('kernel_cache_tol must be non-negative.')
+        self.kernel_cache = (None if kernel_cache_bytes is None else
+                             PuffKernelCache(kernel_cache_bytes))
+        self.kernel_cache_tol = kernel_cache_tol
+        self.engine = engine
         self.array_xy_region = array_xy_region
         self.array_z = array_z
         self.nx = nx
@@ -194,6 +584,8 @@ class ConcentrationArrayGenerator(object):
         # precompute constant used to scale Gaussian kernel amplitude
         self._ampl_const = puff_mol_amount / (8*np.pi**3)**0.5
         self.kernel_rad_mult = kernel_rad_mult
+        # used to evaluate the puff kernels at individual cells
+        self._value_calc = ConcentrationValueCalculator(puff_mol_amount)
 
     def puff_kernel(self, shift_x, shift_y, z_offset, r_sq, even_w, even_h):
         # kernel is truncated to min +/- kernel_rad_mult * effective puff
@@ -210,17 +602,60 @@ class ConcentrationArrayGenerator(object):
         # kernel dimensions will need to be forced to odd/even respectively
         shape[0] = self.round_up_to_next_even_or_odd(shape[0], even_w)
         shape[1] = self.round_up_to_next_even_or_odd(shape[1], even_h)
-        # generate x and y grids with required shape
-        [x_grid, y_grid] = 0.5 + np.mgrid[-shape[0]/2:shape[0]/2,
-                                          -shape[1]/2:shape[1]/2]
+        # generate 1D x and y grids with required shape
+        x_grid = 0.5 + np.arange(-shape[0]/2, shape[0]/2)
+        y_grid = 0.5 + np.arange(-shape[1]/2, shape[1]/2)
         # apply shifts to correct for offset of true centre from nearest
         # grid-point / centre
         x_grid = x_grid * self._dx + shift_x
         y_grid = y_grid * self._dy + shift_y
-        # compute square radial field
-        r_sq_grid = x_grid**2 + y_grid**2 + z_offset**2
-        # output scaled Gaussian kernel
-        return self._ampl_const / r_sq**1.5 * np.exp(-r_sq_grid / (2 * r_sq))
+        # the isotropic Gaussian kernel factorises exactly in to the outer
+        # product of 1D Gaussians in x and y scaled by a z offset factor, so
+        # only w + h exponentials need to be evaluated rather than w * h
+        return np.outer(self._puff_peak(z_offset, r_sq) *
+                        np.exp(-x_grid**2 / (2 * r_sq)),
+                        np.exp(-y_grid**2 / (2 * r_sq)))
+
+    def _puff_peak(self, z_offset, r_sq):
+        # Peak value of the Gaussian kernel in the array plane (scalar or
+        # array arguments).
+        return (self._ampl_const / r_sq**1.5 *
+                np.exp(-z_offset**2 / (2 * r_sq)))
+
+    def _quantize_kernel_params(self, shift_x, shift_y, z_offset, r_sq):
+        # Snaps kernel parameters (scalars or arrays) to the grid set by
+        # kernel_cache_tol when the kernel cache is enabled so that kernels
+        # of nearby puffs share a cache key.
+        tol = self.kernel_cache_tol
+        if self.kernel_cache is None or tol == 0:
+            return shift_x, shift_y, z_offset, r_sq
+        # steps chosen so kernel values change by roughly tol relative: the
+        # puff radius is snapped up to a relative step of tol / 3 (the peak
+        # scales with radius**-3) and the offsets to steps of tol times the
+        # snapped radius over kernel_rad_mult (the Gaussian log-derivative
+        # at the kernel edge), with the z offset snapped towards zero so
+        # puffs passing the kernel_rad_mult check still do after snapping
+        log_step = 2 * math.log1p(tol / 3)
+        r_sq = np.exp(np.ceil(np.log(r_sq) / log_step) * log_step)
+        step = tol * r_sq**0.5 / self.kernel_rad_mult
+        return (np.round(shift_x / step) * step,
+                np.round(shift_y / step) * step,
+                np.trunc(z_offset / step) * step, r_sq)
+
+    def _cached_kernel(self, shift_x, shift_y, z_offset, r_sq, even_w, even_h):
+        # Returns puff_kernel for the given (quantized) parameters, taking it
+        # from the kernel cache if enabled and previously computed.
+        if self.kernel_cache is None:
+            return self.puff_kernel(shift_x, shift_y, z_offset, r_sq,
+                                    even_w, even_h)
+        key = (float(shift_x), float(shift_y), float(z_offset), float(r_sq),
+               bool(even_w), bool(even_h))
+        kernel = self.kernel_cache.get(key)
+        if kernel is None:
+            kernel = self.puff_kernel(shift_x, shift_y, z_offset, r_sq,
+                                      even_w, even_h)
+            self.kernel_cache.put(key, kernel)
+        return kernel
 
     @staticmethod
     def round_up_to_next_even_or_odd(value, to_even):
@@ -240,6 +675,8 @@ class ConcentrationArrayGenerator(object):
         Generates a single concentration field array from an array of puff
         properties.
         """
+        if self.engine == 'batched':
+            return self._generate_single_array_batched(puff_array)
         # initialise concentration array
         conc_array = np.zeros((self.nx, self.ny))
         # loop through all the puffs
@@ -271,12 +708,16 @@ class ConcentrationArrayGenerator(object):
             u = math.floor(2 * p + 0.5) / 2
             # calculate nearest integer or half-integer row index to q
             v = math.floor(2 * q + 0.5) / 2
+            # kernel parameters, snapped to the kernel cache grid if enabled
+            (shift_x, shift_y, puff_z_offset,
+             puff_r_sq) = self._quantize_kernel_params(
+                (p - u) * self._dx, (q - v) * self._dy, puff_z_offset,
+                puff_r_sq)
             # generate puff kernel array of appropriate scale and taking
             # into account true centre offset from nearest half-grid
             # points (u,v)
-            kernel = self.puff_kernel((p - u) * self._dx, (q - v) * self._dy,
-                                      puff_z_offset, puff_r_sq,
-                                      u % 1 == 0, v % 1 == 0)
+            kernel = self._cached_kernel(shift_x, shift_y, puff_z_offset,
+                                         puff_r_sq, u % 1 == 0, v % 1 == 0)
             # compute row and column slices for source kernel array and
             # destination concentration array taking in to the account
             # the possibility of the kernel being partly outside the
@@ -294,6 +735,212 @@ class ConcentrationArrayGenerator(object):
             conc_array[r_rng_arr, c_rng_arr] += kernel[r_rng_knl, c_rng_knl]
         return conc_array
 
+    def _puff_footprints(self, puff_array):
+        """
+        Calculates the kernel parameters and destination array footprints of
+        all the puffs in a puff array which contribute to the concentration
+        array, with the same filtering, rounding and sub-grid shift rules as
+        used for single puffs in `generate_single_array`.
+
+        Returns a tuple of arrays (shift_x, shift_y, z_offset, r_sq, w, h,
+        row_0, col_0) with one entry per contributing puff where (w, h) are
+        the kernel dimensions and (row_0, col_0) the (possibly negative or
+        out of bounds) array indices corresponding to the first kernel value.
+        """
+        puff_array = np.asarray(puff_array, dtype=float).reshape(-1, 4)
+        # placeholder nan entries are contiguous so only consider the puffs
+        # before the first one
+        nan_idx = np.flatnonzero(np.isnan(puff_array[:, 0]))
+        if nan_idx.size > 0:
+            puff_array = puff_array[:nan_idx[0]]
+        px, py, pz, r_sq = puff_array.T
+        z_offset = self.array_z - pz
+        # only puffs with centres within the array region and z-coordinate
+        # within kernel_rad_mult*r_sq of the array evaluation height
+        keep = (self.array_xy_region.contains(px, py) &
+                ~(np.abs(z_offset) / r_sq**0.5 > self.kernel_rad_mult))
+        px, py, z_offset, r_sq = (px[keep], py[keep], z_offset[keep],
+                                  r_sq[keep])
+        # (float) row and column indices corresponding to puff coordinates
+        p = (px - self.array_xy_region.x_min) / self._dx
+        q = (py - self.array_xy_region.y_min) / self._dy
+        # nearest integer or half-integer row and column indices
+        u = np.floor(2 * p + 0.5) / 2
+        v = np.floor(2 * q + 0.5) / 2
+        # kernel parameters, snapped to the kernel cache grid if enabled
+        shift_x, shift_y, z_offset, r_sq = self._quantize_kernel_params(
+            (p - u) * self._dx, (q - v) * self._dy, z_offset, r_sq)
+        # kernel dimensions rounded up to even when centred on grid points
+        # and to odd when centred on grid centres
+        span = 2 * (r_sq * self.kernel_rad_mult**2 - z_offset**2)**0.5
+        w = self._round_up_to_parity(span / self._dx, u % 1 == 0)
+        h = self._round_up_to_parity(span / self._dy, v % 1 == 0)
+        return (shift_x, shift_y, z_offset, r_sq,
+                w, h, (u - w / 2).astype(int), (v - h / 2).astype(int))
+
+    @staticmethod
+    def _round_up_to_parity(values, to_even):
+        # Vectorised round_up_to_next_even_or_odd returning integer array.
+        values = np.ceil(values).astype(int)
+        return values + ((values % 2 == 1) == to_even)
+
+    def _generate_single_array_batched(self, puff_array):
+        """
+        Generates a single concentration field array from an array of puff
+        properties, evaluating the kernels of all puffs with the same kernel
+        dimensions together and depositing them with a scatter-add.
+        """
+        conc_array = np.zeros((self.nx, self.ny))
+        (shift_x, shift_y, z_offset, r_sq,
+         w, h, row_0, col_0) = self._puff_footprints(puff_array)
+        if r_sq.size == 0:
+            return conc_array
+        # group puffs by kernel dimensions rounded up to a coarse set of
+        # sizes (with at most 25% padding) to limit the number of groups
+        bucket_w = self._bucket_size(w)
+        bucket_h = self._bucket_size(h)
+        keys = bucket_w * (bucket_h.max() + 1) + bucket_h
+        order = np.argsort(keys, kind='stable')
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        indices, values = [], []
+        num_cells = 0
+        for group in np.split(order, bounds):
+            gw, gh = bucket_w[group[0]], bucket_h[group[0]]
+            if gw == 0 or gh == 0:
+                continue
+            # stacked kernel grids with sub-grid shifts applied, each row
+            # matching the grid used for a single puff in puff_kernel
+            # followed by any padding up to the group dimensions
+            x_grid = ((np.arange(gw) - w[group, None] / 2 + 0.5) * self._dx +
+                      shift_x[group, None])
+            y_grid = ((np.arange(gh) - h[group, None] / 2 + 0.5) * self._dy +
+                      shift_y[group, None])
+            # separable 1D kernel factors, see puff_kernel
+            g_r_sq = r_sq[group, None]
+            kernels_x = (self._puff_peak(z_offset[group, None], g_r_sq) *
+                         np.exp(-x_grid**2 / (2 * g_r_sq)))
+            kernels_y = np.exp(-y_grid**2 / (2 * g_r_sq))
+            if gw * gh > self.max_scatter_kernel_cells:
+                # large kernels are added directly to the (contiguous)
+                # destination slices as rank-1 updates as building index
+                # arrays for them costs more than the per puff overhead
+                for i, k_x, k_y in zip(group, kernels_x, kernels_y):
+                    if self.kernel_cache is None:
+                        kernel = np.outer(k_x[:w[i]], k_y[:h[i]])
+                    else:
+                        kernel = self._cached_kernel(
+                            shift_x[i], shift_y[i], z_offset[i], r_sq[i],
+                            w[i] % 2 == 0, h[i] % 2 == 0)
+                    self._add_kernel(conc_array, kernel, row_0[i], col_0[i])
+                continue
+            kernels = kernels_x[:, :, None] * kernels_y[:, None, :]
+            # destination array indices of kernel values, dropping padding
+            # and those outside the extents of the array
+            rows = row_0[group, None] + np.arange(gw)
+            cols = col_0[group, None] + np.arange(gh)
+            valid_rows = ((rows >= 0) & (rows < self.nx) &
+                          (rows < (row_0 + w)[group, None]))
+            valid_cols = ((cols >= 0) & (cols < self.ny) &
+                          (cols < (col_0 + h)[group, None]))
+            valid = valid_rows[:, :, None] & valid_cols[:, None, :]
+            flat_idx = (rows * self.ny)[:, :, None] + cols[:, None, :]
+            indices.append(flat_idx[valid])
+            values.append(kernels[valid])
+            num_cells += indices[-1].size
+            if num_cells > self.max_batch_cells:
+                self._scatter_add(conc_array, indices, values)
+                indices, values = [], []
+                num_cells = 0
+        self._scatter_add(conc_array, indices, values)
+        return conc_array
+
+    @staticmethod
+    def _bucket_size(sizes):
+        # Rounds sizes up to multiples of a quarter of the largest power of
+        # two they contain (1, 2, 3, 4, 5, 6, 7, 8, 10, 12, 14, 16, 20, ...).
+        step = 2**np.maximum(np.floor(np.log2(np.maximum(sizes, 1))) - 2, 0)
+        step = step.astype(int)
+        return -(-sizes // step) * step
+
+    def _add_kernel(self, conc_array, kernel, row_0, col_0):
+        # add kernel to concentration array with its first value at
+        # (row_0, col_0) clipping any part outside the array extents
+        (w, h) = kernel.shape
+        r_0, c_0 = max(row_0, 0), max(col_0, 0)
+        r_1, c_1 = min(row_0 + w, self.nx), min(col_0 + h, self.ny)
+        if r_1 > r_0 and c_1 > c_0:
+            conc_array[r_0:r_1, c_0:c_1] += kernel[r_0 - row_0:r_1 - row_0,
+                                                   c_0 - col_0:c_1 - col_0]
+
+    def _scatter_add(self, conc_array, indices, values):
+        # add values to concentration array at flat indices (with repeats)
+        if len(indices) > 0:
+            np.add.at(conc_array.ravel(), np.concatenate(indices),
+                      np.concatenate(values))
+
+    def generate_cell_values(self, puff_array, rows, cols):
+        """
+        Calculates the values at a set of cells of the concentration array
+        which would be generated from an array of puff properties, without
+        generating the whole array.
+
+        Only the puffs whose (truncated) kernels cover each cell are summed,
+        with the kernel values evaluated by a `ConcentrationValueCalculator`
+        so the cost scales with the number of cells queried rather than the
+        array size. Values match `generate_single_array` up to floating
+        point rounding.
+
+        Parameters
+        ----------
+        puff_array : numpy-array-like of floats
+            Array of puff properties (x, y, z, r_sq) with one row per puff.
+        rows : numpy-array-like of integers
+            Row (x) indices of cells. Negative indices count from the end of
+            the array as for numpy indexing.
+        cols : numpy-array-like of integers
+            Column (y) indices of cells, of the same shape as rows.
+        """
+        rows = np.asarray(rows, dtype=int)
+        cols = np.asarray(cols, dtype=int)
+        if rows.shape != cols.shape:
+            raise ValueError('rows and cols must have the same shape.')
+        if (np.any((rows < -self.nx) | (rows >= self.nx)) or
+                np.any((cols < -self.ny) | (cols >= self.ny))):
+            raise IndexError('cell index out of bounds for array of shape '
+                             '{0}.'.format((self.nx, self.ny)))
+        rows, cols = rows % self.nx, cols % self.ny
+        # evaluate each distinct cell only once
+        cells, cell_idx = np.unique((rows * self.ny + cols).ravel(),
+                                    return_inverse=True)
+        cell_rows, cell_cols = cells // self.ny, cells % self.ny
+        (shift_x, shift_y, z_offset, r_sq,
+         w, h, row_0, col_0) = self._puff_footprints(puff_array)
+        # pair each puff with the cells in the rows its kernel spans by
+        # looking them up in the (row sorted) cell list
+        first = np.searchsorted(cell_rows, row_0)
+        counts = np.searchsorted(cell_rows, row_0 + w) - first
+        puff_idx = np.repeat(np.arange(r_sq.size), counts)
+        pair_idx = (np.arange(puff_idx.size) -
+                    np.repeat(np.cumsum(counts) - counts, counts) +
+                    first[puff_idx])
+        # and keep the pairs where the kernel also spans the cell column
+        keep = ((cell_cols[pair_idx] >= col_0[puff_idx]) &
+                (cell_cols[pair_idx] < (col_0 + h)[puff_idx]))
+        puff_idx, pair_idx = puff_idx[keep], pair_idx[keep]
+        # kernel values are those of a Gaussian evaluated at the cell centres
+        # with the puff centred at the nearest half-grid point less the
+        # sub-grid shift (see puff_kernel)
+        values = self._value_calc._puff_conc_dist(
+            (cell_rows[pair_idx] + 0.5) * self._dx,
+            (cell_cols[pair_idx] + 0.5) * self._dy, self.array_z,
+            (row_0 + w / 2)[puff_idx] * self._dx - shift_x[puff_idx],
+            (col_0 + h / 2)[puff_idx] * self._dy - shift_y[puff_idx],
+            self.array_z - z_offset[puff_idx], r_sq[puff_idx])
+        # (bincount returns integers when no puff covers the cells)
+        cell_values = np.bincount(pair_idx, values,
+                                  minlength=cells.size).astype(float)
+        return cell_values[cell_idx].reshape(rows.shape)
+
     def generate_multiple_arrays(self, puff_arrays):
         """
         Generates multiple concentration field arrays from a sequence of
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+A content addressed cache of simulation results.
+
+Every entry is keyed by a hash of the job dictionary (see job_generator), the
+navigator configuration, the seed and the version of the simulation code, and
+holds the trajectory store of the job (see trajectory_store) and the statistics
+computed from it. Entries are directories under the cache directory, the least
+recently used ones are evicted once the cache grows past its size limit.
+
+python result_cache.py list [--dir .result_cache]
+python result_cache.py prune [--dir .result_cache] [--max-bytes N] [--older-than DAYS]
+"""
+
+from __future__ import division
+
+__authors__ = 'Noam Benelli'
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+#modules whose source makes up the code version of a result - everything the
+#simulated trajectories, their stored format and the cached statistics depend on
+CODE_FILES = ('mothpy_models.py', 'carde_navigator.py', 'simulation.py',
+              'casting_competition.py', 'job_generator.py', 'trajectory_recorder.py',
+              'trajectory_store.py', 'plume_tape.py', 'bars.py',
+              os.path.join('pompy', 'models.py'), os.path.join('pompy', 'processors.py'),
+              os.path.join('pompy', 'demos.py'))
+_code_version = None
+
+
+def code_version():
+    #a hash of the source of the simulation modules
+    global _code_version
+    if _code_version is None:
+        sha = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in CODE_FILES:
+            with open(os.path.join(root, name), 'rb') as source:
+                sha.update(source.read())
+        _code_version = sha.hexdigest()
+    return _code_version
+
+
+def job_key(job, navigators, seed, version=None):
+    """
+    Returns the cache key of a job - the sha256 of the job dictionary, the
+    navigator configuration (anything that can be saved as JSON), the seed and
+    the code version (the hash of the current code by default).
+    """
+    if version is None:
+        version = code_version()
+    content = json.dumps({'job': job, 'navigators': navigators, 'seed': seed,
+                          'version': version}, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, f))
+               for root, _, files in os.walk(path) for f in files)
+
+
+class ResultCache(object):
+    """
+    A directory of cached simulation results, at most max_bytes in size.
+    """
+    def __init__(self, directory='.result_cache', max_bytes=4*2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def store_path(self, key):
+        """
+        Returns the path of the trajectory store of a cached job, or None if
+        the job isn't in the cache. Marks the entry as recently used.
+        """
+        entry = self._entry(key)
+        if not os.path.exists(os.path.join(entry, 'meta.json')):
+            return None
+        os.utime(os.path.join(entry, 'meta.json'), None)
+        return os.path.join(entry, 'data.traj')
+
+    def put(self, key, store_path, meta=None):
+        """
+        Adds the trajectory store store_path (a directory store) to the cache
+        as the result of key, with meta (e.g. the job and seed) saved with it,
+        and evicts old entries if the cache is too large.
+        Returns the path of the cached store.
+        """
+        entry = self._entry(key)
+        if not os.path.exists(entry):
+            #the entry is written aside and renamed in to place, so that
+            #concurrent jobs never see a partial entry
+            tmp = tempfile.mkdtemp(dir=self.directory, prefix='.tmp')
+            shutil.copytree(store_path, os.path.join(tmp, 'data.traj'))
+            with open(os.path.join(tmp, 'meta.json'), 'w') as meta_file:
+                json.dump(dict(meta or {}, created=time.time()), meta_file)
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                #another job added the same result first
+                shutil.rmtree(tmp, ignore_errors=True)
+        self.prune(self.max_bytes, keep=(key,))
+        return os.path.join(entry, 'data.traj')
+
+    def stats(self, key, num):
+        """
+        Returns bars.group_stats of the cached store of key in num groups,
+        computed once and saved with the entry. None if key isn't cached.
+        """
+        store_path = self.store_path(key)
+        if store_path is None:
+            return None
+        stats_path = os.path.join(self._entry(key), 'stats{0}.json'.format(num))
+        if os.path.exists(stats_path):
+            with open(stats_path) as stats_file:
+                return json.load(stats_file)
+        from bars import group_stats
+        from trajectory_store import load_store
+        stats_list = [dict((name, float(value)) for name, value in group.items())
+                      for group in group_stats(load_store(store_path), num)]
+        with open(stats_path, 'w') as stats_file:
+            json.dump(stats_list, stats_file)
+        return stats_list
+
+    def entries(self):
+        """
+        Returns a list of (key, size in bytes, last used time, meta) of the
+        cached entries, least recently used first.
+        """
+        entries = []
+        for key in os.listdir(self.directory):
+            meta_path = os.path.join(self._entry(key), 'meta.json')
+            if key.startswith('.') or not os.path.exists(meta_path):
+                continue
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            entries.append((key, _size(self._entry(key)), os.path.getmtime(meta_path), meta))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def remove(self, key):
+        shutil.rmtree(self._entry(key), ignore_errors=True)
+
+    def prune(self, max_bytes=None, older_than=None, keep=()):
+        """
+        Removes the least recently used entries until the cache is at most
+        max_bytes in size, and the entries not used for older_than seconds.
+        Entries in keep are not removed. Returns the removed keys.
+        """
+        entries = self.entries()
+        total = sum(entry[1] for entry in entries)
+        removed = []
+        now = time.time()
+        for key, size, used, _ in entries:
+            if key in keep:
+                continue
+            if (max_bytes is not None and total > max_bytes) or \
+               (older_than is not None and now - used > older_than):
+                self.remove(key)
+                total -= size
+                removed.append(key)
+        return removed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='list or prune the simulation result cache')
+    parser.add_argument('command', choices=('list', 'prune'))
+    parser.add_argument('--dir', default='.result_cache')
+    parser.add_argument('--max-bytes', type=int, default=None)
+    parser.add_argument('--older-than', type=float, default=None, help='days')
+    args = parser.parse_args()
+    cache = ResultCache(args.dir)
+    if args.command == 'list':
+        for key, size, used, meta in cache.entries():
+            print('{0}  {1:10d}  {2}  {3}'.format(key[:16], size,
+                                                  time.strftime('%Y-%m-%d %H:%M', time.localtime(used)),
+                                                  json.dumps(meta.get('job', {}), sort_keys=True)))
+    else:
+        older_than = args.older_than*86400 if args.older_than is not None else None
+        for key in cache.prune(args.max_bytes, older_than):
+            print('removed ' + key)
@@ -12,24 +12,120 @@ __authors__ = 'Noam Benelli'
 import numpy as np
 import os
 import imp
+import json
+import hashlib
+import tempfile
 import mothpy_models
 from pompy import models, processors, demos
+from trajectory_recorder import TrajectoryRecorder
+from result_cache import code_version
+from plume_tape import PlumeTape, PlumeTapeRecorder, ReplayWindModel, ReplayPlumeModel
+
+
+def warm_up(wind_model, plume_model, dt, num_steps, params, warmup_dir):
+    """
+    runs the wind and plume models for num_steps steps, or restores them from
+    a snapshot of an earlier warm up with the same params (a list of the
+    parameters that define the models) saved in warmup_dir.
+    the warm up draws from a random generator seeded by the parameters rather
+    than the global one, so a restored warm up is identical to a computed one
+    and neither of them changes the global random state. that generator is
+    only used during the warm up, so the snapshot holds just the wind and
+    plume states. the key includes the code version (see result_cache), so
+    snapshots of older model code are not loaded
+    """
+    key = hashlib.sha256(json.dumps([params, dt, num_steps, code_version()]
+                                    ).encode('utf-8')).hexdigest()[:16]
+    snapshot = os.path.join(warmup_dir, 'warmup_' + key + '.npz')
+    if os.path.exists(snapshot):
+        models.load_states(snapshot, wind=wind_model, plume=plume_model)
+        return
+    prng = np.random.RandomState(int(key[:8], 16))
+    plume_prng = plume_model.prng
+    plume_model.prng = prng
+    for i in range(num_steps):
+        wind_model.update(dt)
+        plume_model.update(dt)
+    plume_model.prng = plume_prng
+    if not os.path.isdir(warmup_dir):
+        os.makedirs(warmup_dir)
+    #written aside and renamed so that parallel jobs never read a partial file
+    handle, tmp = tempfile.mkstemp(dir=warmup_dir, suffix='.npz')
+    with os.fdopen(handle, 'wb') as tmp_file:
+        models.save_states(tmp_file, wind=wind_model, plume=plume_model)
+    os.replace(tmp, snapshot)
+
   
 def moth_simulation(num_it=10,navigators = (),t_max = 1,
                     char_time=3.5, amplitude = 0.1 ,
                     dt=0.01, puff_release_rate=10,
                     puff_spread_rate = 0.001,
                     draw_iter_interval = 1 ,
-                    prep_plume = False):
+                    prep_plume = False,
+                    conc_sampling = 'grid',
+                    use_swarm = False,
+                    recorder = False,
+                    record_stride = 1,
+                    warmup_dir = None,
+                    record_tape = None,
+                    replay_tape = None,
+                    num_members = 1,
+                    members = None,
+                    cull_peak_ratio = None,
+                    max_puff_age = None):
     """
     a copy of the concetration_array_demo with the moth actions integrated
+
+    conc_sampling - 'grid' renders the whole concentration array every step
+    and the moths read their cell from it, 'points' only evaluates the
+    concentration at the cells the moths are in (same values, the cost
+    scales with the number of moths rather than the array size)
+    use_swarm - update all the moths together with a MothSwarm instead of
+    one MothModular at a time (same trajectories). note - with num_it > 1
+    every iteration of a navigator becomes an independent moth, while without
+    the swarm they share (and all update) the same navigator object
+    recorder - record the trajectories in a TrajectoryRecorder (float32
+    columns) and return it instead of the diff_dict list, which can be
+    produced with recorder.to_diff_dict_list(num_it)
+    record_stride - with recorder, only every record_stride-th draw is
+    recorded (plus the last entry of each navigator)
+    warmup_dir - with prep_plume, the warmed up wind and plume are saved to
+    (and restored from) a snapshot in this directory, so the warm up runs
+    once per set of wind/plume parameters (see warm_up)
+    record_tape - directory to record the wind and plume of every step to
+    (see plume_tape), the run then continues until t_max even if all the
+    moths finished so that the tape covers the whole run
+    replay_tape - directory of a recorded tape to replay instead of
+    simulating the wind and plume (the wind/plume parameters and prep_plume
+    are then ignored, the tape starts after its recorded warm up)
+    num_members - number of independent plume realisations, advanced
+    together by a pompy.models.EnsemblePlumeModel in the wind shared by all
+    of them (requires use_swarm). every moth senses the plume of its own
+    member, by default iteration i of every navigator flies in member
+    i % num_members
+    members - the member of every moth (moth (i,j) has index j*num_it + i),
+    overrides the default assignment
+    cull_peak_ratio - cull the puffs whose peak concentration falls below
+    this ratio of the lowest navigator threshold (see
+    PlumeModel.set_culling_policy)
+    max_puff_age - cull the puffs older than this many seconds
     """
+    if conc_sampling not in ('grid', 'points'):
+        raise ValueError("conc_sampling must be 'grid' or 'points'")
+    if num_members > 1 and not use_swarm:
+        raise ValueError('plume ensembles (num_members > 1) require use_swarm')
+    if num_members > 1 and (warmup_dir is not None or record_tape is not None
+                            or replay_tape is not None):
+        raise ValueError('plume ensembles cannot be warmed up from snapshots '
+                         'or recorded to/replayed from tapes')
     #define simulation region
     wind_region = models.Rectangle(0., -2.,10., 2.)
     sim_region = models.Rectangle(0., -1.,4., 1.)
     #establish the dictionaries and lists that will be used
     navigator_dict ={}
-    del_list = [] # a list of the moth indices (i,j) that finished the track and were deleted 
+    #moth (i,j) has index k = j*num_it + i, flying[k] is False once it
+    #finished the track (or left the region) and only flying moths are updated
+    flying = np.ones(len(navigators)*num_it, dtype=bool)
 
     for j in range(len(navigators)):
         moth_dict = {}
@@ -48,11 +144,37 @@ def moth_simulation(num_it=10,navigators = (),t_max = 1,
     # set up plume model
     pfr = puff_release_rate
     psr = puff_spread_rate
-    plume_model = models.PlumeModel(sim_region, (0.1, 0., 0.), wind_model,
-                                    centre_rel_diff_scale=0.75,
-                                    puff_release_rate = pfr,
-                                    puff_init_rad=0.001,
-                                    puff_spread_rate=psr)
+    if num_members > 1:
+        #the members draw from generators seeded by the global one
+        plume_model = models.EnsemblePlumeModel(sim_region, (0.1, 0., 0.), wind_model,
+                                                num_members,
+                                                centre_rel_diff_scale=0.75,
+                                                puff_release_rate = pfr,
+                                                puff_init_rad=0.001,
+                                                puff_spread_rate=psr,
+                                                seed=np.random.randint(2**31))
+    else:
+        plume_model = models.PlumeModel(sim_region, (0.1, 0., 0.), wind_model,
+                                        centre_rel_diff_scale=0.75,
+                                        puff_release_rate = pfr,
+                                        puff_init_rad=0.001,
+                                        puff_spread_rate=psr)
+    culling = []
+    if cull_peak_ratio is not None or max_puff_age is not None:
+        detection_floor = None
+        if cull_peak_ratio is not None:
+            detection_floor = min(navigator.threshold for navigator in navigators)
+        #the puff_mol_amount of array_gen below
+        plume_model.set_culling_policy(max_puff_age, detection_floor,
+                                       cull_peak_ratio, 1.)
+        culling = [max_puff_age, detection_floor, cull_peak_ratio]
+    if replay_tape is not None:
+        tape = PlumeTape(replay_tape)
+        if abs(tape.dt - dt) > 1e-12:
+            raise ValueError('the tape was recorded with dt = {0}'.format(tape.dt))
+        wind_model = ReplayWindModel(tape)
+        plume_model = ReplayPlumeModel(tape)
+        prep_plume = False
 
     #set concetration array generator
     array_gen = processors.ConcentrationArrayGenerator(sim_region, 0.01, 500,
@@ -60,52 +182,168 @@ def moth_simulation(num_it=10,navigators = (),t_max = 1,
 
 
     #run the wind and plume models for 4 seconds before navigators are started
-    if prep_plume:
+    if prep_plume and warmup_dir is not None:
+        warm_up(wind_model, plume_model, dt, int(4/dt),
+                [char_time, amplitude, pfr, psr] + culling, warmup_dir)
+    elif prep_plume:
         for i in range(int(4/dt)):
             wind_model.update(dt)
             plume_model.update(dt)
 
     
-    # define update and draw functions
-    def update_func(dt, t):
+    tape_recorder = None
+    if record_tape is not None:
+        tape_recorder = PlumeTapeRecorder(record_tape, wind_model, plume_model, dt)
+
+    def update_environment(dt):
         wind_model.update(dt)
         plume_model.update(dt)
-        conc_array = array_gen.generate_single_array(plume_model.puff_array)
+        if tape_recorder is not None:
+            tape_recorder.record()
 
-        for j in range(len(navigators)):
-            #update each individual moth
-            for i in range(num_it):
-                if (i,j) not in del_list:
-                    vel_at_pos = wind_model.velocity_at_pos(navigator_dict["tup{0}".format(j)][0]["moth{0}".format(i)].x,navigator_dict["tup{0}".format(j)][0]["moth{0}".format(i)].y)
-                    navigator_dict["tup{0}".format(j)][0]["moth{0}".format(i)].update(conc_array,vel_at_pos,dt)
+    if use_swarm:
+        #one moth per (i,j), in the same order as the loops below
+        swarm = mothpy_models.MothSwarm([navigators[j] for j in range(len(navigators))
+                                         for i in range(num_it)])
+        if members is None:
+            members = np.arange(len(navigators)*num_it) % num_it % num_members
+        members = np.asarray(members, dtype=int)
+        if len(members) != len(navigators)*num_it or np.any(members >= num_members):
+            raise ValueError('members must hold a member (< num_members) for every moth')
 
+    def sample_conc(x, y, puff_array=None):
+        #concentration at the cells of the moths at positions x, y
+        #returns the concentration array (None if not rendered) and the values
+        if puff_array is None:
+            puff_array = plume_model.puff_array
+        if conc_sampling == 'points':
+            #only the cells the moths are in are evaluated
+            return None, array_gen.generate_cell_values(puff_array,
+                                                        np.asarray(x).astype(int),
+                                                        np.asarray(y).astype(int))
+        conc_array = array_gen.generate_single_array(puff_array)
+        return conc_array, conc_array[np.asarray(x).astype(int), np.asarray(y).astype(int)]
 
-    #each of the moth lists appends the new position given by it's corresponding moth
-    def draw_func():
+    def sample_ensemble_conc(x, y, moth_idx):
+        #every moth samples the plume of its own member
+        concs = np.zeros(len(moth_idx))
+        moth_members = members[moth_idx]
+        for member in np.unique(moth_members):
+            in_member = moth_members == member
+            concs[in_member] = sample_conc(x[in_member], y[in_member],
+                                           plume_model.puff_array(member))[1]
+        return concs
+
+    def update_swarm(dt, t):
+        update_environment(dt)
+        moth_idx = np.flatnonzero(flying)
+        x, y = swarm.x[moth_idx], swarm.y[moth_idx]
+        vel_at_pos = wind_model.velocity_at_positions(x, y)
+        if num_members > 1:
+            concs = sample_ensemble_conc(x, y, moth_idx)
+        else:
+            concs = sample_conc(x, y)[1]
+        swarm.update(concs, vel_at_pos, dt, moth_idx)
+
+    def draw_swarm():
+        xs, ys, Ts = swarm.x.tolist(), swarm.y.tolist(), swarm.T.tolist()
+        odors, gammas, states = swarm.odor.tolist(), swarm.gamma.tolist(), swarm.state_names
         for j in range(len(navigators)):
             for i in range(num_it):
-                if (i,j) not in del_list:
-                    moth_dict = navigator_dict["tup{0}".format(j)][0]
-                    moth_i = moth_dict["moth{0}".format(i)]
-                    (x,y,T,odor,gamma,state,success) = (moth_i.x, moth_i.y, moth_i.T, moth_i.odor, moth_i.gamma, moth_i.state,False)
-                    
+                k = j*num_it + i
+                if flying[k]:
+                    (x,y,T,odor,gamma,state,success) = (xs[k], ys[k], Ts[k], odors[k], gammas[k], states[k], False)
                     if np.sqrt((x-25)**2+((y-500)**2))<15 :
                         success= True
-                        del moth_dict["moth{0}".format(i)]
-                        del_list.append((i,j))
                     #navigators that had reached the simulation's borders are deleted
-                    if moth_i.y<0 or moth_i.y>999 or moth_i.x<0 or moth_i.x >499 :
-                        del moth_dict["moth{0}".format(i)]
-                        del_list.append((i,j))
-                    navigator_dict["tup{0}".format(j)][1]["moth_trajectory_list{0}".format(i)].append((x,y,T,odor,gamma,state,success))                    
+                    if success or y<0 or y>999 or x<0 or x >499 :
+                        flying[k] = False
+                    navigator_dict["tup{0}".format(j)][1]["moth_trajectory_list{0}".format(i)].append((x,y,T,odor,gamma,state,success))
+
+    if recorder:
+        num_moths = len(navigators)*num_it
+        trajectories = TrajectoryRecorder(num_moths, int(t_max/dt + 0.5)//draw_iter_interval,
+                                          record_stride)
+
+    def record(moth_idx, x, y, T, odor, gamma, states):
+        #records the moths moth_idx in the recorder and retires the ones that
+        #succeeded or left the simulation region
+        success = np.sqrt((x-25)**2+((y-500)**2))<15
+        done = success | (y<0) | (y>999) | (x<0) | (x>499)
+        trajectories.record(moth_idx, x, y, T, odor, gamma, states, success, done)
+        flying[moth_idx[done]] = False
+
+    def draw_swarm_recorder():
+        moth_idx = np.flatnonzero(flying)
+        record(moth_idx, swarm.x[moth_idx], swarm.y[moth_idx], swarm.T[moth_idx],
+               swarm.odor[moth_idx], swarm.gamma[moth_idx], swarm.state[moth_idx])
+
+    def draw_recorder():
+        moth_idx = np.flatnonzero(flying)
+        moths = [navigator_dict["tup{0}".format(k // num_it)][0]["moth{0}".format(k % num_it)]
+                 for k in moth_idx]
+        record(moth_idx, np.array([moth.x for moth in moths], dtype=float),
+               np.array([moth.y for moth in moths], dtype=float),
+               np.array([moth.T for moth in moths], dtype=float),
+               np.array([moth.odor for moth in moths], dtype=bool),
+               np.array([moth.gamma for moth in moths], dtype=float),
+               trajectories.state_codes([moth.state for moth in moths]))
+
+    # define update and draw functions
+    def update_func(dt, t):
+        update_environment(dt)
+
+        #gather the moths that are still flying
+        moths = [navigator_dict["tup{0}".format(k // num_it)][0]["moth{0}".format(k % num_it)]
+                 for k in np.flatnonzero(flying)]
+        #the wind at every moth position is interpolated in a single call
+        #note - the positions are read before any of the moths is moved
+        vel_at_pos = wind_model.velocity_at_positions([moth.x for moth in moths],
+                                                      [moth.y for moth in moths])
+        if conc_sampling == 'points':
+            conc_array, concs = sample_conc([int(moth.x) for moth in moths],
+                                            [int(moth.y) for moth in moths])
+        else:
+            #the moths read their own cells from the array
+            conc_array = array_gen.generate_single_array(plume_model.puff_array)
+            concs = [None]*len(moths)
+        #update each individual moth
+        for moth, vel, conc in zip(moths, vel_at_pos, concs):
+            moth.update(conc_array,vel,dt,conc)
+
+
+    #each of the moth lists appends the new position given by it's corresponding moth
+    def draw_func():
+        for k in np.flatnonzero(flying):
+            j, i = divmod(k, num_it)
+            moth_i = navigator_dict["tup{0}".format(j)][0]["moth{0}".format(i)]
+            (x,y,T,odor,gamma,state,success) = (moth_i.x, moth_i.y, moth_i.T, moth_i.odor, moth_i.gamma, moth_i.state,False)
+
+            if np.sqrt((x-25)**2+((y-500)**2))<15 :
+                success= True
+            #navigators that had reached the simulation's borders are deleted
+            if success or moth_i.y<0 or moth_i.y>999 or moth_i.x<0 or moth_i.x >499 :
+                flying[k] = False
+            navigator_dict["tup{0}".format(j)][1]["moth_trajectory_list{0}".format(i)].append((x,y,T,odor,gamma,state,success))
 
     #navigator_dict["tup{0}".format(j)] = (moth_dict,list_dict)
 
 
             
     # start simulation loop
-    demos._simulation_loop(dt, t_max, 0, draw_iter_interval, update_func,
-                     draw_func)
+    if recorder:
+        draw = draw_swarm_recorder if use_swarm else draw_recorder
+    else:
+        draw = draw_swarm if use_swarm else draw_func
+    #the run ends early once every moth finished or left the region
+    #(unless the whole run is recorded to a tape)
+    demos._simulation_loop(dt, t_max, 0, draw_iter_interval,
+                           update_swarm if use_swarm else update_func, draw,
+                           stop_func=None if tape_recorder is not None else lambda: not flying.any())
+    if tape_recorder is not None:
+        tape_recorder.close()
+    if recorder:
+        return trajectories
 
     """
     after the simulation is done, list_dict is reedited to form diff_list_dict.
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Runs a parameter sweep - a list of generate_job configurations - across a
+pool of worker processes. Every job writes its own job and data files as
+soon as it finishes and a failed job does not stop the rest of the sweep.
+"""
+
+from __future__ import division
+
+__authors__ = 'Noam Benelli'
+
+import json
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from job_generator import generate_job
+from casting_competition import create_trajectory_data
+from result_cache import ResultCache
+
+
+def run_job(config, job_file_name, data_file_name, seed, cache_dir=None):
+    """
+    Runs a single job of a sweep (in a worker process): writes the job file
+    and simulates the trajectories with the given seed, or copies them from
+    the result cache in cache_dir.
+    """
+    generate_job(job_file=job_file_name, **config)
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    create_trajectory_data(job_file_name, data_file_name, seed=seed, cache=cache)
+    return job_file_name, data_file_name
+
+
+def _completed(submit, indices, isolate, max_workers):
+    """
+    Runs the jobs indices and yields (index, exception or None) as each one
+    finishes. With isolate every job runs in a pool of its own (at most
+    max_workers at a time), so a dying worker process only fails its own job.
+    """
+    if not isolate:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = dict((submit(executor, i), i) for i in indices)
+            for future in as_completed(futures):
+                yield futures[future], future.exception()
+        return
+    step = max_workers or os.cpu_count() or 1
+    for k in range(0, len(indices), step):
+        executors = [ProcessPoolExecutor(max_workers=1) for i in indices[k:k+step]]
+        try:
+            futures = dict((submit(executor, i), i)
+                           for executor, i in zip(executors, indices[k:k+step]))
+            for future in as_completed(futures):
+                yield futures[future], future.exception()
+        finally:
+            for executor in executors:
+                executor.shutdown()
+
+
+def run_sweep(configs, max_workers=None, seeds=None, base_seed=0,
+              job_file_pattern='job{0}.json', data_file_pattern='data{0}.traj',
+              log_file_name='sweep.jsonl', retries=1, cache_dir=None):
+    """
+    Runs the jobs of a sweep in parallel and yields a record for each job as
+    it finishes (in order of completion).
+
+    configs - list of keyword dictionaries for generate_job (without job_file)
+    max_workers - number of worker processes (defaults to the number of CPUs)
+    seeds - the seed of each job, defaults to base_seed + the job's index
+    job_file_pattern, data_file_pattern - file names of job i, formatted with i
+    log_file_name - every record is appended to this file (one JSON line per
+    job) as soon as the job finishes, None for no log
+    retries - number of times a job is rerun after its worker process died.
+    a dying process fails every job running in the same pool, so the reruns
+    give each job a worker process of its own
+    cache_dir - directory of a result_cache.ResultCache, jobs already in the
+    cache are copied from it instead of simulated
+
+    A record is a dictionary with the job's 'index', 'seed', 'job_file',
+    'data_file', 'config' and 'status' - 'done' or 'failed', with the
+    traceback of a failed job under 'error'.
+    """
+    if seeds is None:
+        seeds = [base_seed + i for i in range(len(configs))]
+    if len(seeds) != len(configs):
+        raise ValueError('one seed is needed for every job')
+
+    def submit(executor, i):
+        return executor.submit(run_job, configs[i], job_file_pattern.format(i),
+                               data_file_pattern.format(i), seeds[i], cache_dir)
+
+    attempts = [0]*len(configs)
+    pending = list(range(len(configs)))
+    isolate = False
+    log_file = open(log_file_name, 'w') if log_file_name is not None else None
+    try:
+        while pending:
+            broken = []
+            for i, error in _completed(submit, pending, isolate, max_workers):
+                attempts[i] += 1
+                if isinstance(error, BrokenProcessPool) and attempts[i] <= retries:
+                    broken.append(i)
+                    continue
+                record = {'index': i, 'seed': seeds[i], 'config': configs[i],
+                          'job_file': job_file_pattern.format(i),
+                          'data_file': data_file_pattern.format(i), 'status': 'done'}
+                if error is not None:
+                    record['status'] = 'failed'
+                    record['error'] = ''.join(traceback.format_exception(
+                        type(error), error, error.__traceback__))
+                if log_file is not None:
+                    log_file.write(json.dumps(record) + '\n')
+                    log_file.flush()
+                yield record
+            pending = sorted(broken)
+            isolate = True
+    finally:
+        if log_file is not None:
+            log_file.close()
@@ -7,11 +7,12 @@ Created on Tue Jul 23 16:53:54 2019
 
 import matplotlib
 import json
+from trajectory_store import load_dict_list
 
 
-def open_data(file_name = 'data0.json'):
-    with open('data0.json') as data_file:  
-        dict_list = json.load(data_file) 
+def open_data(file_name = 'data0.traj'):
+    #a trajectory store or a JSON data file
+    dict_list = load_dict_list(file_name)
     return dict_list
     
     
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Array-backed recording of navigator trajectories for moth_simulation.
+"""
+
+from __future__ import division
+
+__authors__ = 'Noam Benelli'
+
+import numpy as np
+
+
+class TrajectoryRecorder(object):
+    """
+    Records the trajectories of a fixed number of navigators in preallocated
+    numpy columns instead of lists of tuples.
+
+    Each navigator has a row in every column and an end index (length) of the
+    entries recorded for it so far. Positions, times and casting angles are
+    stored as float32, the odor, state and success flags as uint8. With a
+    stride > 1 only every stride-th call to record is kept, apart from the
+    final entry of each navigator (when it succeeds or leaves the region)
+    which is always kept.
+
+    The odor found/lost and turning flags of the legacy diff_list format are
+    derived with np.diff when they are asked for, see to_diff_dict_list.
+    """
+    states = ('wait', 'nav', 'cast')
+
+    def __init__(self, num_navigators, num_records, stride=1):
+        """
+        num_navigators - number of navigators recorded
+        num_records - maximum number of calls to record
+        stride - only every stride-th call to record is kept
+        """
+        if stride < 1:
+            raise ValueError('stride must be a positive integer')
+        self.num_navigators = num_navigators
+        self.stride = stride
+        #every kept call plus a final entry for navigators retiring between them
+        capacity = -(-num_records // stride) + 1
+        shape = (num_navigators, capacity)
+        self.x = np.zeros(shape, dtype=np.float32)
+        self.y = np.zeros(shape, dtype=np.float32)
+        self.T = np.zeros(shape, dtype=np.float32)
+        self.gamma = np.zeros(shape, dtype=np.float32)
+        self.odor = np.zeros(shape, dtype=np.uint8)
+        self.state = np.zeros(shape, dtype=np.uint8)
+        self.success = np.zeros(shape, dtype=np.uint8)
+        self.length = np.zeros(num_navigators, dtype=int)
+        self.num_calls = 0
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, col).nbytes for col in
+                   ('x', 'y', 'T', 'gamma', 'odor', 'state', 'success', 'length'))
+
+    def state_codes(self, state_names):
+        #converts state strings ('wait', 'nav', 'cast') to the stored codes
+        return np.array([self.states.index(name) for name in state_names], dtype=np.uint8)
+
+    def record(self, idx, x, y, T, odor, gamma, state, success, done=None):
+        """
+        Records an entry for each of the navigators idx (indices in increasing
+        order) from arrays with one value per navigator.
+        state - state codes (see state_codes)
+        done - navigators recorded for the last time, kept whatever the stride
+        (defaults to success)
+        """
+        idx = np.asarray(idx, dtype=int)
+        success = np.asarray(success, dtype=bool)
+        if self.num_calls % self.stride == 0:
+            keep = np.ones(idx.size, dtype=bool)
+        else:
+            keep = success if done is None else np.asarray(done, dtype=bool)
+        self.num_calls += 1
+        rows = idx[keep]
+        cols = self.length[rows]
+        if np.any(cols >= self.x.shape[1]):
+            raise IndexError('more entries recorded than num_records allows')
+        for col, values in ((self.x, x), (self.y, y), (self.T, T), (self.gamma, gamma),
+                            (self.odor, odor), (self.state, state), (self.success, success)):
+            col[rows, cols] = np.asarray(values)[keep]
+        self.length[rows] += 1
+
+    def trajectory(self, k):
+        """
+        Returns the recorded columns of navigator k as a dictionary of arrays.
+        """
+        end = self.length[k]
+        return dict((col, getattr(self, col)[k, :end])
+                    for col in ('x', 'y', 'T', 'gamma', 'odor', 'state', 'success'))
+
+    def transition_flags(self):
+        """
+        Returns (odor_change, turning) arrays of the recorded shape.
+        odor_change is +1 where odor was found, -1 where it was lost and 0 otherwise,
+        turning is True where the casting angle or state changed since the last
+        entry. Both are 0 for the first entry of each navigator.
+        """
+        odor_change = np.zeros(self.odor.shape, dtype=np.int8)
+        odor_change[:, 1:] = np.diff(self.odor.astype(np.int8), axis=1)
+        turning = np.zeros(self.odor.shape, dtype=bool)
+        turning[:, 1:] = (np.diff(self.gamma, axis=1) != 0) | (np.diff(self.state, axis=1) != 0)
+        return odor_change, turning
+
+    def to_diff_dict_list(self, num_it=1):
+        """
+        Converts the recording to the list of diff_dict dictionaries returned by
+        moth_simulation, navigator k being iteration k % num_it of navigator
+        k // num_it. Each entry is (x,y,T,odor found/odor lost/None,turning,state,success).
+        """
+        odor_change, turning = self.transition_flags()
+        odor_names = {0: None, 1: 'odor found', -1: 'odor lost'}
+        diff_dict_lst = []
+        for j in range(self.num_navigators // num_it):
+            diff_dict = {}
+            for i in range(num_it):
+                k = j*num_it + i
+                end = self.length[k]
+                diff_dict["diff_list{0}".format(i)] = list(zip(
+                    self.x[k, :end].tolist(), self.y[k, :end].tolist(), self.T[k, :end].tolist(),
+                    [odor_names[c] for c in odor_change[k, :end].tolist()],
+                    turning[k, :end].tolist(),
+                    [self.states[s] for s in self.state[k, :end].tolist()],
+                    self.success[k, :end].astype(bool).tolist()))
+            diff_dict_lst.append(diff_dict)
+        return diff_dict_lst
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Binary columnar storage of simulated trajectories, replacing the data*.json
+files written by casting_competition.
+
+A store holds the entries (x,y,T,odor,turning,state,success) of every
+trajectory as numpy columns with the trajectories one after the other, and an
+offsets index where trajectory k spans offsets[k]:offsets[k+1]. Trajectory k is
+iteration k % num_it of navigator k // num_it, as in the diff_dict lists
+returned by moth_simulation. The titles of the navigators can be stored with
+them. A store is either a directory of .npy files (which can be memory mapped,
+see open_store) or a single .npz archive.
+"""
+
+from __future__ import division
+
+__authors__ = 'Noam Benelli'
+
+import json
+import os
+import numpy as np
+
+
+#columns and their types, odor is 1 for 'odor found', -1 for 'odor lost' and 0
+#otherwise, state is an index in to STATES
+COLUMNS = (('x', np.float32), ('y', np.float32), ('T', np.float32),
+           ('odor', np.int8), ('turning', np.uint8), ('state', np.uint8),
+           ('success', np.uint8))
+STATES = ('wait', 'nav', 'cast')
+ODOR_NAMES = {0: None, 1: 'odor found', -1: 'odor lost'}
+ODOR_CODES = {None: 0, 'odor found': 1, 'odor lost': -1}
+
+
+class TrajectoryStore(object):
+    """
+    Columns of a trajectory store, either loaded or memory mapped.
+    Trajectories and their columns are returned as views of the columns.
+    """
+    def __init__(self, columns, offsets, num_it=1, titles=None):
+        self.columns = columns
+        self.offsets = offsets
+        self.num_it = num_it
+        self.titles = titles
+        self._title_index = None
+
+    def __len__(self):
+        #number of trajectories
+        return len(self.offsets) - 1
+
+    @property
+    def num_navigators(self):
+        return len(self) // self.num_it
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def trajectory(self, k):
+        """
+        Returns the columns of trajectory k as a dictionary of array views.
+        """
+        start, end = self.offsets[k], self.offsets[k + 1]
+        return dict((name, col[start:end]) for name, col in self.columns.items())
+
+    def diff_list(self, k):
+        """
+        Returns trajectory k as a list of (x,y,T,odor,turning,state,success)
+        tuples, as in the diff_dict lists.
+        """
+        traj = self.trajectory(k)
+        return list(zip(traj['x'].tolist(), traj['y'].tolist(), traj['T'].tolist(),
+                        [ODOR_NAMES[c] for c in traj['odor'].tolist()],
+                        traj['turning'].astype(bool).tolist(),
+                        [STATES[s] for s in traj['state'].tolist()],
+                        traj['success'].astype(bool).tolist()))
+
+    def navigator_index(self, navigator):
+        """
+        Returns the index of a navigator given by its index or title.
+        """
+        if isinstance(navigator, str):
+            if self.titles is None:
+                raise KeyError('store has no navigator titles')
+            if self._title_index is None:
+                self._title_index = dict((title, j) for j, title in enumerate(self.titles))
+            return self._title_index[navigator]
+        if not -self.num_navigators <= navigator < self.num_navigators:
+            raise IndexError('navigator index out of range')
+        return navigator % self.num_navigators
+
+    def diff_dict(self, navigator):
+        """
+        Returns the diff_dict of a navigator given by its index or title,
+        reading only its own entries of the columns.
+        """
+        j = self.navigator_index(navigator)
+        return dict(("diff_list{0}".format(i), self.diff_list(j*self.num_it + i))
+                    for i in range(self.num_it))
+
+    def to_dict_list(self):
+        """
+        Converts the store to the list of diff_dict dictionaries returned by
+        moth_simulation (and formerly saved as JSON).
+        """
+        return [self.diff_dict(j) for j in range(self.num_navigators)]
+
+
+def save_columns(path, columns, offsets, num_it=1, titles=None):
+    """
+    Saves trajectory columns (a dictionary with the COLUMNS as keys), the
+    offsets index and optionally the navigator titles to path, a single .npz
+    archive if path ends with .npz and a directory of .npy files otherwise.
+    """
+    arrays = dict((name, np.asarray(columns[name], dtype=dtype)) for name, dtype in COLUMNS)
+    arrays['offsets'] = np.asarray(offsets, dtype=np.int64)
+    arrays['num_it'] = np.array(num_it)
+    if titles is not None:
+        arrays['titles'] = np.array([str(title) for title in titles], dtype=np.str_)
+    if path.endswith('.npz'):
+        np.savez(path, **arrays)
+        return
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    elif os.path.exists(os.path.join(path, 'titles.npy')):
+        #titles of an earlier store saved to the same directory
+        os.remove(os.path.join(path, 'titles.npy'))
+    for name, array in arrays.items():
+        np.save(os.path.join(path, name + '.npy'), array)
+
+
+def save_dict_list(path, dict_list, titles=None):
+    """
+    Saves a list of diff_dict dictionaries (as returned by moth_simulation) to
+    a trajectory store.
+    """
+    num_it = len(dict_list[0]) if len(dict_list) > 0 else 1
+    entries = [diff_dict["diff_list{0}".format(i)]
+               for diff_dict in dict_list for i in range(num_it)]
+    offsets = np.concatenate([[0], np.cumsum([len(diff_list) for diff_list in entries])])
+    rows = [entry for diff_list in entries for entry in diff_list]
+    (x, y, T, odor, turning, state, success) = zip(*rows) if rows else ((),)*7
+    save_columns(path, {'x': x, 'y': y, 'T': T,
+                        'odor': [ODOR_CODES[o] for o in odor],
+                        'turning': turning,
+                        'state': [STATES.index(s) for s in state],
+                        'success': success}, offsets, num_it, titles)
+
+
+def save_recorder(path, recorder, num_it=1, titles=None):
+    """
+    Saves the trajectories of a TrajectoryRecorder to a trajectory store,
+    without going through lists of tuples.
+    """
+    odor_change, turning = recorder.transition_flags()
+    #entries of each navigator, row by row
+    recorded = np.arange(recorder.x.shape[1]) < recorder.length[:, None]
+    offsets = np.concatenate([[0], np.cumsum(recorder.length)])
+    save_columns(path, {'x': recorder.x[recorded], 'y': recorder.y[recorded],
+                        'T': recorder.T[recorded], 'odor': odor_change[recorded],
+                        'turning': turning[recorded], 'state': recorder.state[recorded],
+                        'success': recorder.success[recorded]}, offsets, num_it, titles)
+
+
+def load_store(path, mmap_mode=None):
+    """
+    Loads a trajectory store saved by save_columns. The columns of a directory
+    store are memory mapped if mmap_mode is given (e.g. 'r').
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as archive:
+            arrays = dict((name, archive[name]) for name in archive.files)
+    else:
+        names = [os.path.splitext(f)[0] for f in os.listdir(path) if f.endswith('.npy')]
+        arrays = dict((name, np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode))
+                      for name in names)
+    columns = dict((name, arrays[name]) for name, _ in COLUMNS)
+    titles = arrays['titles'].tolist() if 'titles' in arrays else None
+    return TrajectoryStore(columns, np.asarray(arrays['offsets']), int(arrays['num_it']), titles)
+
+
+def open_store(path):
+    """
+    Opens a trajectory store for random access to individual navigators (see
+    TrajectoryStore.diff_dict). The columns of a directory store are memory
+    mapped, so only the pages of the trajectories read are loaded.
+    """
+    return load_store(path, mmap_mode='r')
+
+
+def is_store(path):
+    return path.endswith('.npz') or os.path.isdir(path)
+
+
+def find_data_file(path):
+    """
+    Returns path if it exists, and otherwise the first existing data file with
+    the same name and a .traj, .npz or .json extension, so that the scripts
+    reading data0.traj still run on a data0.json file. Returns path when
+    there is none.
+    """
+    if os.path.exists(path):
+        return path
+    base = os.path.splitext(path)[0]
+    for ext in ('.traj', '.npz', '.json'):
+        if os.path.exists(base + ext):
+            return base + ext
+    return path
+
+
+def load_dict_list(path):
+    """
+    Loads a list of diff_dict dictionaries from either a trajectory store or
+    a (legacy) JSON data file, see find_data_file.
+    """
+    path = find_data_file(path)
+    if is_store(path):
+        return load_store(path).to_dict_list()
+    with open(path) as data_file:
+        return json.load(data_file)
+
+
+def diff_dict_reader(path):
+    """
+    Returns a function giving the diff_dict of a navigator, by index (or title
+    for a store with titles), read from a trajectory store opened with
+    open_store or from a JSON data file, see find_data_file.
+    """
+    path = find_data_file(path)
+    if is_store(path):
+        return open_store(path).diff_dict
+    return load_dict_list(path).__getitem__
+
+
+def convert_json(json_path, store_path, titles=None):
+    """
+    Converts a JSON data file written by casting_competition to a trajectory
+    store.
+    """
+    with open(json_path) as data_file:
+        save_dict_list(store_path, json.load(data_file), titles)
+
+
+if __name__ == "__main__":
+    #python trajectory_store.py data0.json [data0.traj] - converts JSON data files
+    import sys
+    json_path = sys.argv[1]
+    store_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(json_path)[0] + '.traj'
+    convert_json(json_path, store_path)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+# the modules import each other as top level modules (run from mothpy/), the
+# directory is appended so that mothpy/statistics.py does not shadow the
+# standard library module
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'mothpy'))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Group statistics of trajectory stores against the per-navigator statistics
+of bars.
+"""
+
+import json
+import numpy as np
+import pytest
+import bars
+import trajectory_store
+
+
+def diff_dict_list(num_navigators, num_it, seed=0):
+    #random trajectories of waiting, dud and successful navigators, with
+    #float32 values as in a store
+    prng = np.random.RandomState(seed)
+    dict_list = []
+    for j in range(num_navigators):
+        diff_dict = {}
+        for i in range(num_it):
+            length = prng.randint(4, 15)
+            dud = prng.rand() < 0.1
+            num_waits = length if dud else prng.randint(0, length - 1)
+            success = not dud and prng.rand() < 0.6
+            xy = np.cumsum(prng.uniform(-1., 1., (length, 2)), 0)
+            xy, T = xy.astype(np.float32), np.float32(0.01 * np.arange(length))
+            odor = prng.choice([None, None, 'odor found', 'odor lost'], length)
+            diff_dict['diff_list{0}'.format(i)] = [
+                (float(xy[k, 0]), float(xy[k, 1]), float(T[k]), odor[k],
+                 bool(prng.rand() < 0.3), 'wait' if k < num_waits else
+                 prng.choice(['nav', 'cast']), success and k == length - 1)
+                for k in range(length)]
+        dict_list.append(diff_dict)
+    return dict_list
+
+
+@pytest.mark.parametrize('num_it', [1, 3])
+def test_group_stats_match_calc_stats(tmp_path, num_it):
+    dict_list = diff_dict_list(40, num_it)
+    path = str(tmp_path / 'data.traj')
+    trajectory_store.save_dict_list(path, dict_list)
+    group_stats = bars.group_stats(trajectory_store.load_store(path), 4)
+    assert all(stats['relative_time'] > 0 for stats in group_stats)
+    for group, stats in zip(bars.multi_splice(dict_list, 4), group_stats):
+        np.testing.assert_allclose(
+            [stats['success_precentage'], stats['relative_time'],
+             stats['time_standard_error'], stats['average_time'],
+             stats['search_efficiency']],
+            bars.calc_stats(group) + [bars.average_time(group),
+                                      bars.search_efficiency(group)],
+            rtol=1e-9)
+    #the same statistics are read from the store and from JSON
+    json_path = str(tmp_path / 'data.json')
+    with open(json_path, 'w') as outfile:
+        json.dump(dict_list, outfile)
+    np.testing.assert_allclose(bars.get_data(path, 4),
+                               bars.get_data(json_path, 4), rtol=1e-9)
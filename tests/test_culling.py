@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Puff culling policies of the plume models.
+"""
+
+import numpy as np
+import pytest
+import mothpy_models
+from pompy import models
+
+SIM_REGION = models.Rectangle(0., -1., 4., 1.)
+
+
+def plume_model(**params):
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    return wind_model, models.PlumeModel(
+        SIM_REGION, (0.1, 0., 0.), wind_model, centre_rel_diff_scale=0.75,
+        puff_release_rate=100, puff_init_rad=0.001, puff_spread_rate=0.001,
+        prng=np.random.RandomState(0), **params)
+
+
+def test_culled_puffs():
+    #culled puffs are exactly those past the age or peak limits
+    wind_model, plume = plume_model()
+    plume.set_culling_policy(max_age=0.5)
+    for i in range(200):
+        wind_model.update(0.01)
+        plume.update(0.01)
+        assert (plume.puff_array[:, 3] <= 0.001**2 + 0.001 * 0.5).all()
+    assert plume.total_culled > 0
+    plume.set_culling_policy(detection_floor=100., min_peak_ratio=0.5)
+    wind_model.update(0.01)
+    plume.update(0.01)
+    peaks = 1. / (8 * np.pi**3)**0.5 / plume.puff_array[:, 3]**1.5
+    assert (peaks >= 50.).all()
+
+
+def test_num_culled_reset_when_disabled():
+    wind_model, plume = plume_model()
+    plume.set_culling_policy(max_age=0.05)
+    for i in range(100):
+        wind_model.update(0.01)
+        plume.update(0.01)
+    assert plume.num_culled > 0
+    total = plume.total_culled
+    plume.set_culling_policy()
+    wind_model.update(0.01)
+    plume.update(0.01)
+    assert plume.num_culled == 0 and plume.total_culled == total
+
+
+@pytest.mark.parametrize('params', [dict(detection_floor=0.),
+                                    dict(detection_floor=1., min_peak_ratio=0),
+                                    dict(max_age=-1.)])
+def test_invalid_policies(params):
+    wind_model, plume = plume_model()
+    with pytest.raises(ValueError):
+        plume.set_culling_policy(**params)
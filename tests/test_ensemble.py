@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Plume ensemble members against separate plume models.
+"""
+
+import numpy as np
+import pytest
+import mothpy_models
+from pompy import models
+
+SIM_REGION = models.Rectangle(0., -1., 4., 1.)
+
+
+@pytest.mark.parametrize('max_age', [None, 0.5])
+def test_members_match_plume_models(max_age):
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    params = dict(centre_rel_diff_scale=0.75, puff_release_rate=100,
+                  puff_init_rad=0.001, puff_spread_rate=0.001)
+    ensemble = models.EnsemblePlumeModel(
+        SIM_REGION, (0.1, 0., 0.), wind_model, 3,
+        prngs=[np.random.RandomState(k) for k in range(3)], **params)
+    plumes = [models.PlumeModel(SIM_REGION, (0.1, 0., 0.), wind_model,
+                                prng=np.random.RandomState(k), **params)
+              for k in range(3)]
+    ensemble.set_culling_policy(max_age)
+    for plume in plumes:
+        plume.set_culling_policy(max_age)
+    for i in range(300):
+        wind_model.update(0.01)
+        ensemble.update(0.01)
+        for plume in plumes:
+            plume.update(0.01)
+    for k, plume in enumerate(plumes):
+        np.testing.assert_array_equal(ensemble.puff_array(k), plume.puff_array)
+        assert ensemble.total_culled[k] == plume.total_culled
+    assert (ensemble.total_culled > 0).all() == (max_age is not None)
+
+
+def test_seeded_members():
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    ensembles = [models.EnsemblePlumeModel(SIM_REGION, (0.1, 0., 0.),
+                                           wind_model, 4, seed=3)
+                 for i in range(2)]
+    for i in range(50):
+        for ensemble in ensembles:
+            ensemble.update(0.01)
+    arrays = [ensemble.puff_arrays for ensemble in ensembles]
+    for k in range(4):
+        np.testing.assert_array_equal(arrays[0][k], arrays[1][k])
+    assert not np.array_equal(arrays[0][0][-5:], arrays[0][1][-5:])
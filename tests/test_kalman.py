@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+The batched Kalman filter against the per-trajectory kalman_filter.
+"""
+
+import numpy as np
+import pytest
+from kalman import kalman_filter, kalman_filter_list
+
+#the legacy filter uses np.matrix
+pytestmark = pytest.mark.filterwarnings('ignore::PendingDeprecationWarning')
+
+
+def diff_dict(prng, num_it, length, dt=0.01):
+    #random walks, in grid cell units, with some plateaus
+    dict_ = {}
+    for i in range(num_it):
+        steps = prng.normal(0, 2, (length, 2)) * (prng.rand(length, 1) < 0.8)
+        x, y = (np.array([300., 500.]) + np.cumsum(steps, axis=0)).T
+        dict_["diff_list{0}".format(i)] = [
+            (x[j], y[j], dt*j, None, bool(j % 7 == 0), 'nav', False)
+            for j in range(length)]
+    return dict_
+
+
+def test_batch_matches_kalman_filter():
+    prng = np.random.RandomState(0)
+    #trajectories shorter and longer than the convergence of the gain, and
+    #a second time step
+    dict_list = [diff_dict(prng, 2, 1200), diff_dict(prng, 1, 2),
+                 diff_dict(prng, 3, 50), diff_dict(prng, 1, 400, dt=0.02)]
+    for kalman_dict, expected in zip(kalman_filter_list(dict_list),
+                                     [kalman_filter(d) for d in dict_list]):
+        assert sorted(kalman_dict) == sorted(expected)
+        for key in expected:
+            batch = np.array([entry[:2] for entry in kalman_dict[key]])
+            legacy = np.array([entry[:2] for entry in expected[key]])
+            assert batch.shape == legacy.shape
+            #the steady state gain is only reused once it changes by less
+            #than 1e-12, the remaining differences are rounding
+            np.testing.assert_allclose(batch, legacy, rtol=0, atol=1e-6)
+            assert [entry[2:] for entry in kalman_dict[key]] == \
+                [entry[2:] for entry in expected[key]]
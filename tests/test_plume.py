@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+The array based plume model against the original list of Puff objects, and
+the multi-source plume model.
+"""
+
+import numpy as np
+import pytest
+import mothpy_models
+from pompy import models
+
+#the spline velocity_at_pos converts (1, 1) arrays to floats
+pytestmark = pytest.mark.filterwarnings('ignore::DeprecationWarning')
+
+
+def list_update(puffs, plume_model, prng, dt):
+    #PlumeModel.update as it was with a list of Puff objects
+    if len(puffs) < plume_model.max_num_puffs:
+        num_to_release = prng.poisson(plume_model.puff_release_rate*dt)
+        num_to_release = min(num_to_release,
+                             plume_model.max_num_puffs - len(puffs))
+        for i in range(num_to_release):
+            puffs.append(models.Puff(*plume_model._new_puff_params))
+    alive_puffs = []
+    vel_dim = 3 if plume_model.model_z_disp else 2
+    for puff in puffs:
+        wind_vel = np.zeros(vel_dim)
+        wind_vel[:2] = plume_model.wind_model.velocity_at_pos(puff.x, puff.y)
+        filament_diff_vel = (prng.normal(size=vel_dim) *
+                             plume_model.centre_rel_diff_scale)
+        vel = wind_vel + filament_diff_vel
+        puff.x += vel[0] * dt
+        puff.y += vel[1] * dt
+        if plume_model.model_z_disp:
+            puff.z += vel[2] * dt
+        puff.r_sq += plume_model.puff_spread_rate * dt
+        if plume_model.sim_region.contains(puff.x, puff.y):
+            alive_puffs.append(puff)
+    return alive_puffs, len(puffs) - len(alive_puffs)
+
+
+@pytest.mark.parametrize('model_z_disp', [True, False])
+def test_matches_puff_list(model_z_disp):
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    plume_model = models.PlumeModel(
+        models.Rectangle(0., -1., 2., 1.), (0.1, 0., 0.), wind_model,
+        model_z_disp=model_z_disp, centre_rel_diff_scale=0.75, puff_release_rate=100,
+        puff_init_rad=0.001, puff_spread_rate=0.001, max_num_puffs=200,
+        prng=np.random.RandomState(0))
+    prng = np.random.RandomState(0)
+    puffs = [models.Puff(*plume_model._new_puff_params) for i in range(50)]
+    num_left = 0
+    for i in range(300):
+        wind_model.update(0.01)
+        plume_model.update(0.01)
+        puffs, num_dropped = list_update(puffs, plume_model, prng, 0.01)
+        num_left += num_dropped
+        assert plume_model.num_puffs == len(puffs)
+        np.testing.assert_allclose(plume_model.puff_array,
+                                   [tuple(puff) for puff in puffs],
+                                   rtol=1e-12, atol=1e-12)
+    #puffs were dropped from the list as they left the region
+    assert num_left > 0
+    assert [tuple(puff) for puff in plume_model.puffs] == \
+        [tuple(row) for row in plume_model.puff_array]
+
+
+def test_single_source_matches_plume_model():
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    params = dict(centre_rel_diff_scale=0.75, puff_init_rad=0.001,
+                  puff_spread_rate=0.001)
+    plume_model = models.PlumeModel(
+        models.Rectangle(0., -1., 2., 1.), (0.1, 0., 0.), wind_model,
+        puff_release_rate=100, prng=np.random.RandomState(0), **params)
+    multi_model = models.MultiSourcePlumeModel(
+        models.Rectangle(0., -1., 2., 1.), [(0.1, 0., 0.)], wind_model, 100,
+        prng=np.random.RandomState(0), **params)
+    for i in range(300):
+        wind_model.update(0.01)
+        plume_model.update(0.01)
+        multi_model.update(0.01)
+    np.testing.assert_array_equal(multi_model.puff_array,
+                                  plume_model.puff_array)
+    assert not multi_model.source_ids.any()
+
+
+def test_puffs_tagged_with_sources():
+    #sources at different heights without z dispersion, so the height of a
+    #puff tells which source released it
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    sources = [(0.1, 0., 0.), (0.5, 0.5, 1.), (1., -0.5, 2.)]
+    plume_model = models.MultiSourcePlumeModel(
+        models.Rectangle(0., -1., 2., 1.), sources, wind_model,
+        [100, 50, 200], model_z_disp=False, centre_rel_diff_scale=0.75,
+        puff_init_rad=0.001, puff_spread_rate=0.001, max_num_puffs=400,
+        prng=np.random.RandomState(0))
+    for i in range(300):
+        wind_model.update(0.01)
+        plume_model.update(0.01)
+        np.testing.assert_array_equal(plume_model.source_ids,
+                                      plume_model.puff_array[:, 2])
+    counts = np.bincount(plume_model.source_ids, minlength=3)
+    assert (counts > 0).all() and counts.sum() == plume_model.num_puffs
+    np.testing.assert_array_equal(plume_model.source_puff_array(1)[:, 2], 1.)
+    #the state round trips with the source ids
+    state = plume_model.get_state()
+    plume_model.update(0.01)
+    plume_model.set_state(state)
+    np.testing.assert_array_equal(plume_model.source_ids,
+                                  plume_model.puff_array[:, 2])
+    np.testing.assert_array_equal(plume_model.puff_array, state['puffs'])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Recording and replaying wind/plume tapes.
+"""
+
+import os
+import random
+import numpy as np
+import pytest
+import mothpy_models
+from pompy import models
+from plume_tape import PlumeTape, PlumeTapeRecorder
+from simulation import moth_simulation
+from casting_competition import NAVIGATOR_GROUPS
+
+SIM_REGION = models.Rectangle(0., -1., 4., 1.)
+
+
+def navigators():
+    #navigators drawing only when constructed (the waiting random walk is
+    #left out), started close enough to the source to find and lose the odour
+    random.seed(1)
+    return [mothpy_models.MothModular(SIM_REGION, 100 - 2*i, 500 - 10*i, nav,
+                                      cast, 1)
+            for wait, cast, nav in NAVIGATOR_GROUPS for i in range(3)]
+
+
+@pytest.mark.parametrize('use_swarm', [False, True])
+def test_replay_matches_recording(tmp_path, use_swarm):
+    tape = str(tmp_path / 'tape')
+    np.random.seed(1)
+    expected = moth_simulation(1, navigators(), 1, 3.5, 0.1, 0.01, 100, 0.001,
+                               1, True, use_swarm=use_swarm, record_tape=tape)
+    assert any(entry[3] == 'odor found' for diff_dict in expected
+               for entry in diff_dict['diff_list0'])
+    #the replay neither simulates nor draws from the wind and plume
+    #parameters or the global generator
+    np.random.seed(2)
+    assert moth_simulation(1, navigators(), 1, 7., 0.3, 0.01, 10, 0.01, 1,
+                           True, use_swarm=use_swarm,
+                           replay_tape=tape) == expected
+    with pytest.raises(ValueError):
+        moth_simulation(1, navigators(), 1, dt=0.02, replay_tape=tape)
+
+
+def test_interrupted_tape(tmp_path):
+    path = str(tmp_path / 'tape')
+    np.random.seed(3)
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    plume_model = models.PlumeModel(SIM_REGION, (0.1, 0., 0.), wind_model,
+                                    puff_release_rate=100)
+    recorder = PlumeTapeRecorder(path, wind_model, plume_model, 0.01)
+    recorded = []
+    for i in range(20):
+        wind_model.update(0.01)
+        plume_model.update(0.01)
+        recorder.record()
+        recorded.append((wind_model.get_state()['u'],
+                         plume_model.puff_array.copy()))
+    recorder._puff_file.flush()
+    recorder._wind_file.flush()
+    recorder._index_file.flush()
+    #a recording stopped part way through writing the puffs of its last step
+    puffs_path = os.path.join(path, 'puffs.dat')
+    with open(puffs_path, 'r+b') as puff_file:
+        puff_file.truncate(os.path.getsize(puffs_path) - 8 * 4 * 3)
+    tape = PlumeTape(path)
+    assert tape.num_steps == 19
+    for step in range(19):
+        np.testing.assert_array_equal(tape.wind[step, 0], recorded[step][0])
+        np.testing.assert_array_equal(tape.puff_array(step), recorded[step][1])
+    with pytest.raises(IndexError):
+        tape.check_step(19)
+    recorder.close()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+The batched concentration array engine and point sampling against the
+original per-puff loop, the puff kernel cache, tiled concentration grids
+and the puff spatial index against brute force.
+"""
+
+import numpy as np
+import pytest
+import mothpy_models
+from pompy import models, processors
+
+SIM_REGION = models.Rectangle(0., -1., 4., 1.)
+
+
+@pytest.fixture(scope='module')
+def puff_array():
+    #a developed plume as in moth_simulation, with some puffs partly outside
+    #the array region
+    prng = np.random.RandomState(0)
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    plume_model = models.PlumeModel(SIM_REGION, (0.1, 0., 0.), wind_model,
+                                    centre_rel_diff_scale=0.75,
+                                    puff_release_rate=100, puff_init_rad=0.001,
+                                    puff_spread_rate=0.001, prng=prng)
+    for i in range(200):
+        wind_model.update(0.01)
+        plume_model.update(0.01)
+    edge_puffs = np.array([[0.001, 0., 0., 0.001], [3.999, 0.99, 0.01, 0.002],
+                           [2., -0.999, 0., 0.0005]])
+    return np.concatenate((plume_model.puff_array, edge_puffs))
+
+
+def generator(engine):
+    return processors.ConcentrationArrayGenerator(SIM_REGION, 0.01, 500, 1000,
+                                                  1., engine=engine)
+
+
+def test_batched_matches_loop(puff_array):
+    loop = generator('loop').generate_single_array(puff_array)
+    batched = generator('batched').generate_single_array(puff_array)
+    assert loop.max() > 0
+    np.testing.assert_allclose(batched, loop, rtol=1e-9, atol=1e-9*loop.max())
+
+
+def test_cell_values_match_grid(puff_array):
+    array_gen = generator('batched')
+    grid = array_gen.generate_single_array(puff_array)
+    prng = np.random.RandomState(1)
+    rows = prng.randint(0, 500, 2000)
+    cols = prng.randint(0, 1000, 2000)
+    #cells around the source, where the plume is dense
+    rows[:500] = prng.randint(0, 50, 500)
+    cols[:500] = prng.randint(450, 550, 500)
+    values = array_gen.generate_cell_values(puff_array, rows, cols)
+    np.testing.assert_allclose(values, grid[rows, cols], rtol=1e-9,
+                               atol=1e-9*grid.max())
+
+
+@pytest.mark.parametrize('engine', ['loop', 'batched'])
+def test_empty_puff_array(engine):
+    array_gen = generator(engine)
+    empty = np.zeros((0, 4))
+    assert not array_gen.generate_single_array(empty).any()
+    values = array_gen.generate_cell_values(empty, np.array([0, 250]),
+                                            np.array([0, 500]))
+    assert values.shape == (2,) and not values.any()
+
+
+def test_cell_values_without_covering_puffs(puff_array):
+    #cells away from every puff get float zeros, as moth_simulation compares
+    #and records them alongside the values of covered cells
+    values = generator('batched').generate_cell_values(
+        puff_array[:1], np.array([499, 400]), np.array([0, 999]))
+    assert values.dtype == float and not values.any()
+
+
+def test_spatial_index_finds_puffs_in_range(puff_array):
+    #every puff within kernel_rad_mult radii of a point is a candidate, and
+    #the indexed sums are the exact sums truncated at that range
+    index = processors.PuffSpatialIndex(puff_array)
+    prng = np.random.RandomState(2)
+    x = np.concatenate((prng.uniform(0., 4., 300), prng.uniform(0., 0.5, 300)))
+    y = np.concatenate((prng.uniform(-1., 1., 300), prng.uniform(-.1, .1, 300)))
+    px, py, pz, r_sq = puff_array.T
+    dist_sq = (x[:, None] - px)**2 + (y[:, None] - py)**2
+    in_range = dist_sq <= 9 * r_sq
+    point_idx, (cx, cy, cz, c_r_sq) = index.candidates(x, y)
+    found = np.zeros_like(in_range)
+    puff_idx = [np.flatnonzero((px == a) & (py == b) & (r_sq == r))[0]
+                for a, b, r in zip(cx, cy, c_r_sq)]
+    found[point_idx, puff_idx] = True
+    assert in_range.any() and not (in_range & ~found).any()
+    calc = processors.ConcentrationValueCalculator(1.)
+    exact = calc._puff_conc_dist(x[:, None], y[:, None], 0., px, py, pz, r_sq)
+    truncated = np.where(dist_sq + pz**2 <= 9 * r_sq, exact, 0.).sum(-1)
+    np.testing.assert_allclose(calc.calc_conc_list(None, x, y, index=index),
+                               truncated, rtol=1e-9, atol=1e-12)
+
+
+def test_spatial_index_empty():
+    index = processors.PuffSpatialIndex(np.full((3, 4), np.nan))
+    calc = processors.ConcentrationValueCalculator(1.)
+    values = calc.calc_conc_list(None, np.array([0., 1.]), np.array([0., 0.]),
+                                 index=index)
+    assert index.num_puffs == 0 and not values.any()
+
+
+@pytest.mark.parametrize('engine', ['loop', 'batched'])
+def test_kernel_cache_exact_without_tolerance(puff_array, engine):
+    plain = generator(engine).generate_single_array(puff_array)
+    array_gen = processors.ConcentrationArrayGenerator(
+        SIM_REGION, 0.01, 500, 1000, 1., engine=engine,
+        kernel_cache_bytes=2**24, kernel_cache_tol=0.)
+    misses = []
+    for i in range(2):
+        np.testing.assert_allclose(
+            array_gen.generate_single_array(puff_array), plain, rtol=1e-12,
+            atol=1e-12*plain.max())
+        misses.append(array_gen.kernel_cache.misses)
+    #the second call finds all its kernels in the cache
+    assert misses[0] == misses[1] and array_gen.kernel_cache.hits > 0
+
+
+def test_kernel_cache_tolerance(puff_array):
+    #snapped kernels change the values by about the tolerance, the same way
+    #for both engines
+    plain = generator('batched').generate_single_array(puff_array)
+    arrays = [processors.ConcentrationArrayGenerator(
+        SIM_REGION, 0.01, 500, 1000, 1., engine=engine,
+        kernel_cache_bytes=2**24).generate_single_array(puff_array)
+        for engine in ('loop', 'batched')]
+    np.testing.assert_allclose(arrays[1], arrays[0], rtol=1e-9,
+                               atol=1e-9*plain.max())
+    assert abs(arrays[0] - plain).max() < 0.05 * plain.max()
+
+
+def test_kernel_cache_evicts_least_recently_used():
+    cache = processors.PuffKernelCache(max_bytes=3 * 800)
+    for key in 'abc':
+        cache.put(key, np.zeros(100))
+    assert cache.get('a') is not None
+    cache.put('d', np.zeros(100))
+    assert 'b' not in cache and all(key in cache for key in 'acd')
+    cache.put('e', np.zeros(1000))
+    assert 'e' not in cache and len(cache) == 3
+    assert cache.get('b') is None and not cache.get('a').flags.writeable
+    assert cache.stats()['evictions'] == 1
+    assert (cache.hits, cache.misses, cache.num_bytes) == (2, 1, 2400)
+
+
+@pytest.mark.parametrize('max_chunk_bytes, num_threads',
+                         [(None, None), (2**16, None), (2**16, 3),
+                          (2**9, None)])
+def test_tiled_conc_grid(puff_array, max_chunk_bytes, num_threads):
+    #tiles of down to a few dozen (point, puff) pairs against a sum over all
+    #of the puffs at each point
+    calc = processors.ConcentrationValueCalculator(1.)
+    x, y = np.meshgrid(np.linspace(0., 4., 60), np.linspace(-1., 1., 30),
+                       indexing='ij')
+    full = calc.calc_conc_list(puff_array, x.ravel(), y.ravel()).reshape(
+        x.shape)
+    out = np.full(x.shape, np.nan)
+    conc = calc.calc_conc_grid(puff_array, x, y, out=out,
+                               max_chunk_bytes=max_chunk_bytes,
+                               num_threads=num_threads)
+    assert conc is out and full.max() > 0
+    np.testing.assert_allclose(out, full, rtol=1e-12, atol=1e-12*full.max())
+    with pytest.raises(ValueError):
+        calc.calc_conc_grid(puff_array, x, y, out=np.empty((30, 60)))
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Model state snapshots and the cached plume warm up.
+"""
+
+import os
+import random
+import numpy as np
+import mothpy_models
+from pompy import models
+from simulation import warm_up
+
+SIM_REGION = models.Rectangle(0., -1., 4., 1.)
+
+
+def wind_and_plume(prng=np.random):
+    wind_model = mothpy_models.WindModel(models.Rectangle(0., -2., 10., 2.),
+                                         21, 11, 1, 3.5, 0.1)
+    plume_model = models.PlumeModel(SIM_REGION, (0.1, 0., 0.), wind_model,
+                                    centre_rel_diff_scale=0.75,
+                                    puff_release_rate=100, puff_init_rad=0.001,
+                                    puff_spread_rate=0.001, prng=prng)
+    return wind_model, plume_model
+
+
+def run(wind_model, plume_model, num_steps):
+    for i in range(num_steps):
+        wind_model.update(0.01)
+        plume_model.update(0.01)
+    return wind_model.velocity_field.copy(), plume_model.puff_array.copy()
+
+
+def test_restored_models_continue_identically(tmp_path):
+    np.random.seed(0)
+    prng, py_prng = np.random.RandomState(1), random.Random(2)
+    wind_model, plume_model = wind_and_plume(prng)
+    run(wind_model, plume_model, 150)
+    path = str(tmp_path / 'state.npz')
+    models.save_states(path, wind=wind_model, plume=plume_model, prng=prng,
+                       py_prng=py_prng, global_prng=np.random)
+    expected = run(wind_model, plume_model, 100) + (py_prng.random(),)
+    np.random.seed(5)
+    prng, py_prng = np.random.RandomState(3), random.Random(4)
+    wind_model, plume_model = wind_and_plume(prng)
+    models.load_states(path, wind=wind_model, plume=plume_model, prng=prng,
+                       py_prng=py_prng, global_prng=np.random)
+    restored = run(wind_model, plume_model, 100) + (py_prng.random(),)
+    for value, expected_value in zip(restored, expected):
+        np.testing.assert_array_equal(value, expected_value)
+
+
+def test_warm_up_snapshot(tmp_path):
+    warmup_dir = str(tmp_path / 'warmup')
+    params = [3.5, 0.1, 100, 0.001]
+    states = []
+    for i in range(2):
+        #neither the computed nor the restored warm up draws from the global
+        #generator
+        np.random.seed(6)
+        wind_model, plume_model = wind_and_plume()
+        global_state = np.random.get_state()
+        warm_up(wind_model, plume_model, 0.01, 200, params, warmup_dir)
+        assert len(os.listdir(warmup_dir)) == 1
+        np.testing.assert_array_equal(np.random.get_state()[1],
+                                      global_state[1])
+        states.append((wind_model.get_state(), plume_model.get_state()))
+    for computed, restored in zip(*states):
+        assert sorted(computed) == sorted(restored)
+        for key in computed:
+            np.testing.assert_array_equal(restored[key], computed[key])
+    assert len(states[0][1]['puffs']) > 50
+    #other parameters get a snapshot of their own
+    wind_model, plume_model = wind_and_plume()
+    warm_up(wind_model, plume_model, 0.01, 200, params[:3] + [0.002],
+            warmup_dir)
+    assert len(os.listdir(warmup_dir)) == 2
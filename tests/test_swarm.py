@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+MothSwarm against the per-navigator MothModular updates.
+"""
+
+import copy
+import random
+import numpy as np
+import pytest
+import mothpy_models
+from pompy import models
+from simulation import moth_simulation
+from casting_competition import NAVIGATOR_GROUPS
+
+SIM_REGION = models.Rectangle(0., -1., 4., 1.)
+
+
+def test_swarm_matches_navigators():
+    #every combination of navigation, casting and waiting types under the
+    #same (random) odour and wind inputs
+    random.seed(3)
+    navigators = [mothpy_models.MothModular(SIM_REGION, 400., 500., nav, cast,
+                                            wait, duration=0.05)
+                  for nav in (1, 2, 3, 4, 'alex')
+                  for cast in (0, 1, 2, 3, 4, 'carde1', 'carde2')
+                  for wait in (1, 2, 'crw')]
+    swarm = mothpy_models.MothSwarm([copy.deepcopy(moth) for moth in navigators])
+    num = len(navigators)
+    prng = np.random.RandomState(5)
+    steps = 500
+    concs = (prng.rand(steps, num) < 0.3) * 1000.
+    winds = np.stack((prng.uniform(0.5, 1.5, (steps, num)),
+                      prng.uniform(-0.5, 0.5, (steps, num))), -1)
+    active = [np.flatnonzero(prng.rand(num) < 0.9) for step in range(steps)]
+    np.random.seed(7)
+    expected = []
+    for step in range(steps):
+        for k in active[step]:
+            navigators[k].update(None, winds[step, k], 0.01, concs[step, k])
+        expected.append([(moth.x, moth.y, moth.T, moth.odor, moth.gamma,
+                          moth.state) for moth in navigators])
+    np.random.seed(7)
+    for step in range(steps):
+        swarm.update(concs[step, active[step]], winds[step, active[step]],
+                     0.01, active[step])
+        states = swarm.state_names
+        assert [(swarm.x[k], swarm.y[k], swarm.T[k], swarm.odor[k],
+                 swarm.gamma[k], states[k]) for k in range(num)] == expected[step]
+
+
+@pytest.mark.parametrize('conc_sampling', ['grid', 'points'])
+def test_swarm_simulation_matches_navigators(conc_sampling):
+    #a seeded moth_simulation of the casting_competition navigator groups,
+    #started close enough to the source to find and lose the odour
+    def run(use_swarm):
+        np.random.seed(1)
+        random.seed(1)
+        navigators = []
+        for wait, cast, nav in NAVIGATOR_GROUPS:
+            for i in range(5):
+                navigators.append(mothpy_models.MothModular(
+                    SIM_REGION, 100 - 2*i, 500 - 10*i, nav, cast, wait))
+        return moth_simulation(1, navigators, 1.5, 3.5, 0.1, 0.01, 100, 0.001,
+                               1, True, conc_sampling=conc_sampling,
+                               use_swarm=use_swarm)
+    expected = run(False)
+    assert any(entry[3] == 'odor found' for diff_dict in expected
+               for entry in diff_dict['diff_list0'])
+    assert run(True) == expected
+
+
+def test_swarm_rejects_other_navigators():
+    moth = mothpy_models.CompactMoth(SIM_REGION, 400., 500., 1, 1, 1)
+    with pytest.raises(ValueError):
+        mothpy_models.MothSwarm([mothpy_models.MothModular(SIM_REGION, 400., 500., 1, 1, 1), moth])
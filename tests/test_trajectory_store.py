@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Trajectory stores against the diff_dict lists they replace.
+"""
+
+import json
+import os
+import numpy as np
+import pytest
+import mothpy_models
+import trajectory_store
+from pompy import models
+from simulation import moth_simulation
+
+
+def as_lists(dict_list):
+    #diff_dict lists as read back from JSON
+    return json.loads(json.dumps(dict_list))
+
+
+@pytest.fixture(scope='module')
+def simulated():
+    #2 navigators x 3 iterations recorded, as create_trajectory_data does
+    np.random.seed(4)
+    sim_region = models.Rectangle(0., -1., 4., 1.)
+    navigators = [mothpy_models.MothModular(sim_region, 100, 500 - 10*i, 1,
+                                            cast, 1) for i, cast in
+                  enumerate((1, 'carde1'))]
+    recorder = moth_simulation(3, navigators, 1, dt=0.01, use_swarm=True,
+                               conc_sampling='points', recorder=True)
+    return recorder, ['first', 'second']
+
+
+@pytest.mark.parametrize('name', ['data.traj', 'data.npz'])
+def test_store_round_trips(tmp_path, simulated, name):
+    recorder, titles = simulated
+    dict_list = recorder.to_diff_dict_list(3)
+    path = str(tmp_path / name)
+    trajectory_store.save_recorder(path, recorder, 3, titles)
+    store = trajectory_store.load_store(path)
+    assert (store.num_navigators, len(store), store.titles) == (2, 6, titles)
+    assert as_lists(store.to_dict_list()) == as_lists(dict_list)
+    #the same store written from the diff_dict lists
+    copy_path = str(tmp_path / ('copy' + name))
+    trajectory_store.save_dict_list(copy_path, dict_list, titles)
+    copy = trajectory_store.load_store(copy_path)
+    for name, dtype in trajectory_store.COLUMNS:
+        assert copy[name].dtype == dtype
+        np.testing.assert_array_equal(copy[name], store[name])
+    np.testing.assert_array_equal(copy.offsets, store.offsets)
+
+
+def test_json_fallback(tmp_path, simulated):
+    recorder, titles = simulated
+    dict_list = as_lists(recorder.to_diff_dict_list(3))
+    json_path = str(tmp_path / 'data0.json')
+    with open(json_path, 'w') as outfile:
+        json.dump(dict_list, outfile)
+    #scripts reading data0.traj get the JSON file until it is converted
+    traj_path = str(tmp_path / 'data0.traj')
+    assert trajectory_store.find_data_file(traj_path) == json_path
+    assert trajectory_store.load_dict_list(traj_path) == dict_list
+    assert trajectory_store.diff_dict_reader(traj_path)(1) == dict_list[1]
+    trajectory_store.convert_json(json_path, traj_path, titles)
+    assert trajectory_store.find_data_file(traj_path) == traj_path
+    reader = trajectory_store.diff_dict_reader(traj_path)
+    assert as_lists(reader('second')) == dict_list[1]
+    assert as_lists(trajectory_store.load_dict_list(traj_path)) == dict_list
+    missing = str(tmp_path / 'data1.traj')
+    assert trajectory_store.find_data_file(missing) == missing
+    assert not os.path.exists(missing)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+WindModel interpolators, interpolation methods and batched queries.
+"""
+
+import numpy as np
+import pytest
+import scipy.interpolate as interp
+import mothpy_models
+from pompy import models
+
+WIND_REGION = models.Rectangle(0., -2., 10., 2.)
+
+
+def wind_model(interp_method='spline', seed=0, steps=300):
+    #the 21x11 meandering field of the README figures
+    np.random.seed(seed)
+    wind = mothpy_models.WindModel(WIND_REGION, 21, 11, 1, 7, 0.3,
+                                   interp_method=interp_method)
+    for i in range(steps):
+        wind.update(0.01)
+    return wind
+
+
+def points(num, region=(0., -1., 4., 1.), seed=1):
+    prng = np.random.RandomState(seed)
+    return (prng.uniform(region[0], region[2], num),
+            prng.uniform(region[1], region[3], num))
+
+
+def test_interpolators_built_lazily():
+    #the splines are fitted on the first query after the field changes only
+    wind = wind_model('spline', steps=0)
+    x, y = points(50)
+    for i in range(5):
+        wind.update(0.01)
+        wind.velocity_field
+    assert wind.interp_rebuild_count == 0
+    for i in range(3):
+        wind.update(0.01)
+        for j in range(4):
+            vel = wind.velocity_at_positions(x, y)
+    assert wind.interp_rebuild_count == 3
+    assert wind.interp_query_count == 12
+    #the lazily fitted splines are those of the current field
+    u = interp.RectBivariateSpline(wind.x_points, wind.y_points,
+                                   wind.velocity_field[:, :, 0])
+    np.testing.assert_array_equal(vel[:, 0], u.ev(x, y))
+    wind.set_state(wind_model('spline', seed=1, steps=10).get_state())
+    np.testing.assert_array_equal(
+        wind.velocity_at_positions(x, y),
+        wind_model('spline', seed=1, steps=10).velocity_at_positions(x, y))
+    assert wind.interp_rebuild_count == 4
+
+
+@pytest.mark.filterwarnings('ignore::DeprecationWarning')
+def test_spline_batch_matches_single_points():
+    #velocity_at_pos evaluates the splines over the grid spanned by its
+    #(scalar) arguments, velocity_at_positions pointwise
+    wind = wind_model('spline')
+    x, y = points(300)
+    single = np.array([wind.velocity_at_pos(xi, yi) for xi, yi in zip(x, y)])
+    batch = wind.velocity_at_positions(x, y)
+    assert batch.shape == (300, 2)
+    np.testing.assert_allclose(batch, single, rtol=1e-12, atol=1e-12)
+    assert wind.velocity_at_positions(x[:0], y[:0]).shape == (0, 2)
+
+
+@pytest.mark.parametrize('interp_method', ['bicubic', 'bilinear'])
+def test_grid_methods_exact_at_grid_points(interp_method):
+    wind = wind_model(interp_method)
+    gx, gy = np.meshgrid(wind.x_points, wind.y_points, indexing='ij')
+    vel = wind.velocity_at_positions(gx.ravel(), gy.ravel())
+    np.testing.assert_allclose(vel, wind.velocity_field.reshape(-1, 2),
+                               rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize('interp_method', ['bicubic', 'bilinear'])
+def test_grid_single_point_matches_batch(interp_method):
+    wind = wind_model(interp_method)
+    #including points outside the grid, which are clamped to its edges
+    x, y = points(500, (-1., -3., 11., 3.))
+    single = np.array([wind.velocity_at_pos(xi, yi) for xi, yi in zip(x, y)])
+    np.testing.assert_array_equal(single, wind.velocity_at_positions(x, y))
+
+
+@pytest.mark.parametrize('interp_method, tol', [('bicubic', 5e-4),
+                                                ('bilinear', 5e-3)])
+def test_grid_methods_close_to_spline(interp_method, tol):
+    #the same field interpolated with each method
+    wind = wind_model('spline')
+    x, y = points(5000)
+    ref = wind.velocity_at_positions(x, y)
+    wind.interp_method = interp_method
+    wind._interp_set = False
+    vel = wind.velocity_at_positions(x, y)
+    rel = np.linalg.norm(vel - ref, axis=1) / np.linalg.norm(ref, axis=1)
+    assert rel.max() < tol
+
+
+def test_padded_field_built_once_per_update():
+    wind = wind_model('bicubic')
+    builds = []
+    padded_field = wind._padded_field
+    wind._padded_field = lambda: builds.append(1) or padded_field()
+    x, y = points(100)
+    for i in range(3):
+        wind.update(0.01)
+        wind.velocity_at_positions(x, y)
+        wind.velocity_at_pos(1., 0.)
+        wind.velocity_at_positions(x, y)
+    assert len(builds) == 3